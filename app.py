@@ -1,14 +1,19 @@
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify
 from flask_cors import CORS
 from flask_restful import Api
 from flask_security import Security
 from flask_jwt_extended import JWTManager
-from werkzeug.security import generate_password_hash
+from flask_migrate import Migrate
 import os
 
 from controllers.database import db
 from controllers.config import Config
 from controllers.user_datastore import user_datastore
+from controllers.metrics import init_metrics, render_metrics
+from controllers.serialization import output_json
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+BASELINE_REVISION = "0001"   # schema that db.create_all() produced before migrations existed
 
 # --------------------- App Factory ---------------------
 def create_app():
@@ -18,8 +23,12 @@ def create_app():
     # Enable CORS
     CORS(app)
 
-    # Initialize DB
+    # Initialize DB + migrations (flask db upgrade / migrate)
     db.init_app(app)
+    Migrate(app, db, directory=MIGRATIONS_DIR)
+
+    # Per-request latency / SQL statement metrics (served on /metrics)
+    init_metrics(app)
 
     # Initialize JWT
     JWTManager(app)
@@ -27,21 +36,29 @@ def create_app():
     # Initialize Flask-Security
     Security(app, user_datastore)
 
-    # Initialize API
+    # Initialize API; JSON bodies go through the fast serializer (gzip/br when accepted)
     api = Api(app)
+    api.representation("application/json")(output_json)
 
     return app, api
 
 
-# --------------------- DB Initialization ---------------------
-from sqlalchemy import text
+# --------------------- Provisioning ---------------------
+ADMIN_EMAIL = 'adminmail@gmail.com'
+ADMIN_PASSWORD = 'adminpss'
 
-def init_db(app):
+def provision(app):
+    """One-time setup: migrate the schema, create the roles and the admin user.
+    Run it with `flask --app app provision` (deploy step), not on every import."""
+    from flask_migrate import upgrade, stamp
+    from controllers.passwords import hash_password, verify_password, needs_rehash
     with app.app_context():
-        # 🔥 FORCE DROP old tables (one-time fix for Postgres)
-        db.session.commit()
-        
-        db.create_all()
+        # Databases created by the old db.create_all() have tables but no
+        # alembic_version; mark them as the baseline so upgrade() only adds what's new
+        inspector = db.inspect(db.engine)
+        if inspector.has_table("users") and not inspector.has_table("alembic_version"):
+            stamp(directory=MIGRATIONS_DIR, revision=BASELINE_REVISION)
+        upgrade(directory=MIGRATIONS_DIR)
 
         # -------------------- Roles --------------------
         admin_role = user_datastore.find_or_create_role(
@@ -52,16 +69,18 @@ def init_db(app):
         )
 
         # -------------------- Admin User --------------------
-        admin_user = user_datastore.find_user(email='adminmail@gmail.com')
+        admin_user = user_datastore.find_user(email=ADMIN_EMAIL)
         if not admin_user:
             admin_user = user_datastore.create_user(
                 name='admin',
-                email='adminmail@gmail.com',
-                password=generate_password_hash('adminpss'),
+                email=ADMIN_EMAIL,
+                password=hash_password(ADMIN_PASSWORD),
                 roles=[admin_role]
             )
         else:
-            admin_user.password = generate_password_hash('adminpss')
+            # Only rehash when the stored hash is stale or no longer matches
+            if needs_rehash(admin_user.password) or not verify_password(admin_user.password, ADMIN_PASSWORD):
+                admin_user.password = hash_password(ADMIN_PASSWORD)
             if admin_role not in admin_user.roles:
                 admin_user.roles.append(admin_role)
 
@@ -71,18 +90,21 @@ def init_db(app):
 
 # --------------------- Create App ---------------------
 app, api = create_app()
-init_db(app)   # ✅ IMPORTANT: runs on Render also
+
+# Opt-in for hosts without a separate deploy step; every worker pays for it
+if os.getenv("PROVISION_ON_STARTUP") == "1":
+    provision(app)
 
 
 # --------------------- Import API Resources ---------------------
 from controllers.routes.authen_apis import LoginAPI, LogoutAPI, RegisterAPI
 from controllers.routes.admin_apis import (
     ParkingLOTCreator, ParkingLOTViewer, ParkingLOTEditor, ParkingLOTDeleter,
-    UserViewer, AdminDashSummary, Admin_AllBookings, AdminRevenue
+    UserViewer, AdminDashSummary, AdminDashboard, Admin_AllBookings, AdminRevenue, Admin_CSVExport
 )
 from controllers.routes.user_apis import (
-    User_ViewLots, User_ReserveSpot, User_ReleaseSpot,
-    User_ParkHistory, User_Summary, User_CSVExport
+    User_ViewLots, User_LotStream, User_LotStreamToken, User_ReserveSpot, User_ReleaseSpot,
+    User_BulkReserve, User_BulkRelease, User_ParkHistory, User_Summary, User_CSVExport
 )
 
 # --------------------- Add Routes ---------------------
@@ -98,43 +120,91 @@ api.add_resource(ParkingLOTEditor, '/api/admin/edit_lot/<int:lot_id>')
 api.add_resource(ParkingLOTDeleter, '/api/admin/delete_lot/<int:lot_id>')
 api.add_resource(UserViewer, '/api/admin/view_users')
 api.add_resource(AdminDashSummary, '/api/admin/summary')
+api.add_resource(AdminDashboard, '/api/admin/dashboard')
 api.add_resource(Admin_AllBookings, '/api/admin/bookings')
 api.add_resource(AdminRevenue, '/api/admin/revenue_bylot')
+api.add_resource(Admin_CSVExport, '/api/admin/export_csv')
 
 # User
 api.add_resource(User_ViewLots, '/api/user/view_lots')
+api.add_resource(User_LotStream, '/api/user/lots/stream')
+api.add_resource(User_LotStreamToken, '/api/user/lots/stream_token')
 api.add_resource(User_ReserveSpot, '/api/user/taking_spot')
 api.add_resource(User_ReleaseSpot, '/api/user/leaving_spot')
+api.add_resource(User_BulkReserve, '/api/user/taking_spots')
+api.add_resource(User_BulkRelease, '/api/user/leaving_spots')
 api.add_resource(User_ParkHistory, '/api/user/booking_history')
 api.add_resource(User_Summary, '/api/user/summary')
 api.add_resource(User_CSVExport, '/api/user/export_csv')
 
 
+# --------------------- Metrics ---------------------
+@app.route('/metrics')
+def metrics():
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
 # --------------------- Test / Celery Routes ---------------------
+# Task modules (and the Celery/Redis client) load on first use, not at import
 @app.route('/test-email')
 def test_email():
-    from tasks import send_daily_reminders
-    task = send_daily_reminders.delay()
+    from tasks import sendparkingreminders
+    task = sendparkingreminders.delay()
     return jsonify({
         'message': 'Email task queued successfully!',
         'task_id': task.id
     })
 
 
-from tasks import sendparkingreminders, send_monthly_parking_report
-
 @app.route("/test-daily-reminder")
 def testdailyreminder():
+    from tasks import sendparkingreminders
     task = sendparkingreminders.delay()
     return {"message": "Daily reminder task queued!", "task_id": task.id}
 
 
 @app.route("/test-monthly-report")
 def testmonthlyreport():
+    from tasks import send_monthly_parking_report
     task = send_monthly_parking_report.delay()
     return {"message": "Monthly report task queued!", "task_id": task.id}
 
 
+# --------------------- CLI Commands ---------------------
+@app.cli.command("provision")
+def provision_command():
+    """Apply migrations and create the roles and admin user."""
+    provision(app)
+
+
+@app.cli.command("recount-spots")
+def recount_spots():
+    """Rebuild every lot's available/occupied counters from parking_spots."""
+    from controllers.availability import recount_lot_counters
+    updated = recount_lot_counters()
+    print(f"Recounted spot counters for {updated} lots.")
+
+
+@app.cli.command("rebuild-revenue")
+def rebuild_revenue():
+    """Recompute the revenue_rollups table from completed reservations."""
+    from controllers.revenue import rebuild_revenue_rollups
+    written = rebuild_revenue_rollups()
+    print(f"Rebuilt {written} lot/day revenue buckets.")
+
+
+@app.cli.command("archive-reservations")
+def archive_reservations():
+    """Move completed reservations older than ARCHIVE_AFTER_DAYS to the archive table now."""
+    from datetime import datetime, timedelta
+    from tasks import archive_completed_reservations
+    cutoff = datetime.utcnow() - timedelta(days=app.config["ARCHIVE_AFTER_DAYS"])
+    moved = archive_completed_reservations(
+        db.engine, cutoff, app.config["ARCHIVE_BATCH_SIZE"], app.config["ARCHIVE_MAX_BATCHES"]
+    )
+    print(f"Archived {moved} reservations that ended before {cutoff:%Y-%m-%d %H:%M}.")
+
+
 # --------------------- Run App ---------------------
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
@@ -0,0 +1,439 @@
+"""Latency and throughput benchmark for every API endpoint.
+
+Generates a synthetic dataset (lots, spots, users, historical reservations),
+then drives every resource registered in app.py through the Flask test client:
+--requests calls per endpoint one after another, and with --threads a mixed
+read/write load from that many concurrent clients for --seconds. Reports
+p50/p95/p99 latency, throughput and SQL statements per request, and saves
+everything as JSON so two commits can be compared.
+
+    python benchmarks/bench_api.py                                   # default dataset
+    python benchmarks/bench_api.py --users 5000 --reservations 200000 --requests 200
+    python benchmarks/bench_api.py --threads 8 --seconds 20          # adds the load mode
+    python benchmarks/bench_api.py --output before.json
+    python benchmarks/bench_api.py --output after.json --compare before.json
+
+The dataset is derived from --seed, so runs with the same arguments are
+comparable. Uses a throwaway SQLite file unless DATABASE_URL is set.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BENCH_PASSWORD = "bench-password"
+INSERT_BATCH = 5000
+BULK_COUNT = 10          # spots per taking_spots / leaving_spots call
+
+# Relative weights of the multi-threaded mix (reads dominate, as in production)
+LOAD_MIX = {
+    "GET /api/user/view_lots": 30,
+    "POST /api/user/taking_spot|leaving_spot": 20,
+    "GET /api/user/booking_history": 10,
+    "GET /api/user/summary": 10,
+    "GET /api/admin/bookings": 10,
+    "GET /api/admin/view_lots": 5,
+    "GET /api/admin/dashboard": 5,
+    "GET /api/admin/summary": 5,
+    "POST /api/login": 2,
+}
+
+
+# ------------------------ Data generator ------------------------
+def generate(db, lots, spots_per_lot, users, reservations, seed):
+    """Bulk-insert the synthetic dataset; returns the ids the scenarios need."""
+    from sqlalchemy import insert
+    from controllers.models import User, UserRoles, ParkingLot, Reservation
+    from controllers.availability import add_spots, recount_lot_counters
+    from controllers.revenue import rebuild_revenue_rollups
+    from controllers.passwords import hash_password
+    from controllers.user_datastore import user_datastore
+
+    rng = random.Random(seed)
+    user_role = user_datastore.find_or_create_role("user", description="Regular user role")
+    db.session.flush()
+
+    # One real hash shared by every user keeps generation fast and login benchmarkable
+    password = hash_password(BENCH_PASSWORD)
+    first_id = (db.session.query(db.func.max(User.id)).scalar() or 0) + 1
+    user_ids = list(range(first_id, first_id + users))
+    for start in range(0, users, INSERT_BATCH):
+        batch = user_ids[start:start + INSERT_BATCH]
+        db.session.execute(insert(User), [
+            {"id": uid, "name": f"bench{uid}", "email": f"bench{uid}@example.com", "password": password, "active": True}
+            for uid in batch])
+        db.session.execute(insert(UserRoles), [{"user_id": uid, "role_id": user_role.id} for uid in batch])
+
+    lot_rows = []
+    for i in range(lots):
+        lot = ParkingLot(location_name=f"Bench Lot {i}", price=rng.choice((10, 20, 30, 40, 50)),
+                         pin_code=f"{560000 + i}", number_of_spots=spots_per_lot)
+        db.session.add(lot)
+        db.session.flush()
+        add_spots(lot.id, spots_per_lot)
+        lot_rows.append((lot.id, lot.price))
+
+    spots = db.session.execute(db.text("SELECT id, lot_id FROM parking_spots")).fetchall()
+    price_of = dict(lot_rows)
+    bench_spots = [(spot_id, lot_id) for spot_id, lot_id in spots if lot_id in price_of]
+    start = datetime.utcnow() - timedelta(days=365)
+    rows = []
+    for _ in range(reservations):
+        spot_id, lot_id = rng.choice(bench_spots)
+        parked = start + timedelta(minutes=rng.randrange(365 * 24 * 60 - 600))
+        hours = rng.choice((0.5, 1, 2, 3, 4, 8))
+        rows.append({
+            "user_id": rng.choice(user_ids), "spot_id": spot_id,
+            "parking_time": parked, "exit_time": parked + timedelta(hours=hours),
+            "parking_cost": round(hours * price_of[lot_id], 2), "current_status": "completed"
+        })
+        if len(rows) == INSERT_BATCH:
+            db.session.execute(insert(Reservation), rows)
+            rows = []
+    if rows:
+        db.session.execute(insert(Reservation), rows)
+    db.session.commit()
+
+    recount_lot_counters()
+    rebuild_revenue_rollups()
+    return user_ids, [lot_id for lot_id, _ in lot_rows]
+
+
+def mint_tokens(user_ids):
+    """Access tokens with the same claims /api/login issues, without paying for a hash per user."""
+    from flask_jwt_extended import create_access_token
+    from controllers.models import User
+
+    tokens = {}
+    for user in User.query.filter(User.id.in_(user_ids)):
+        tokens[user.id] = {"Authorization": "Bearer " + create_access_token(
+            identity=user.email, additional_claims={
+                "roles": [r.name for r in user.roles], "token_uniquifier": user.fs_token_uniquifier})}
+    return tokens
+
+
+# ------------------------ Scenarios ------------------------
+class Context:
+    """Ids, tokens and per-run state the scenarios share."""
+
+    def __init__(self, admin, users, lots, edit_lot_id):
+        self.admin = admin
+        self.users = users                # [(user_id, headers)]
+        self.lots = lots
+        self.edit_lot_id = edit_lot_id
+        self.held = defaultdict(list)     # user_id -> spot ids reserved by the benchmark
+        self.created_lots = []
+        self.lock = threading.Lock()
+        self.run_id = int(time.time() * 1000)
+
+    def user(self, i):
+        return self.users[i % len(self.users)]
+
+
+def reserve(client, ctx, i):
+    user_id, headers = ctx.user(i)
+    response = client.post("/api/user/taking_spot", json={"lot_id": ctx.lots[i % len(ctx.lots)]}, headers=headers)
+    if response.status_code == 201:
+        with ctx.lock:
+            ctx.held[user_id].append(response.get_json()["spot_id"])
+    return response
+
+
+def release(client, ctx, i):
+    user_id, headers = ctx.user(i)
+    with ctx.lock:
+        spot_id = ctx.held[user_id].pop() if ctx.held[user_id] else None
+    return client.post("/api/user/leaving_spot", json={"spot_id": spot_id}, headers=headers)
+
+
+def reserve_bulk(client, ctx, i):
+    user_id, headers = ctx.user(i)
+    response = client.post("/api/user/taking_spots", headers=headers, json={
+        "count": BULK_COUNT, "lot_ids": [ctx.lots[(i + k) % len(ctx.lots)] for k in range(3)]})
+    if response.status_code == 201:
+        with ctx.lock:
+            ctx.held[user_id].extend(r["spot_id"] for r in response.get_json()["reservations"])
+    return response
+
+
+def release_bulk(client, ctx, i):
+    user_id, headers = ctx.user(i)
+    with ctx.lock:
+        spot_ids, ctx.held[user_id] = ctx.held[user_id][-BULK_COUNT:], ctx.held[user_id][:-BULK_COUNT]
+    return client.post("/api/user/leaving_spots", json={"spot_ids": spot_ids}, headers=headers)
+
+
+def reserve_or_release(client, ctx, i):
+    user_id, _ = ctx.user(i)
+    return release(client, ctx, i) if ctx.held[user_id] else reserve(client, ctx, i)
+
+
+def open_stream(client, ctx, i):
+    # What an EventSource client does: fetch a stream token, then open the stream with it
+    _, headers = ctx.user(i)
+    token = client.post("/api/user/lots/stream_token", headers=headers).get_json().get("stream_token")
+    return client.get(f"/api/user/lots/stream?jwt={token}")
+
+
+def create_lot(client, ctx, i):
+    response = client.post("/api/admin/create_lot", headers=ctx.admin, json={
+        "location_name": f"Created {ctx.run_id}-{i}", "price": 25, "pin_code": "560001", "number_of_spots": 20})
+    if response.status_code == 201:
+        ctx.created_lots.append(response.get_json()["lot_id"])
+    return response
+
+
+def delete_lot(client, ctx, i):
+    lot_id = ctx.created_lots.pop() if ctx.created_lots else 0
+    return client.delete(f"/api/admin/delete_lot/{lot_id}", headers=ctx.admin)
+
+
+SCENARIOS = {
+    "POST /api/login": lambda c, ctx, i: c.post(
+        "/api/login", json={"username": f"bench{ctx.user(i)[0]}", "password": BENCH_PASSWORD}),
+    "POST /api/register": lambda c, ctx, i: c.post("/api/register", json={
+        "username": f"reg{ctx.run_id}-{i}", "email": f"reg{ctx.run_id}-{i}@example.com", "password": "secret1"}),
+    "POST /api/logout": lambda c, ctx, i: c.post("/api/logout", headers=ctx.user(i)[1]),
+    "GET /api/user/view_lots": lambda c, ctx, i: c.get("/api/user/view_lots", headers=ctx.user(i)[1]),
+    "POST /api/user/lots/stream_token": lambda c, ctx, i: c.post("/api/user/lots/stream_token", headers=ctx.user(i)[1]),
+    "GET /api/user/lots/stream": open_stream,
+    "POST /api/user/taking_spot": reserve,
+    "POST /api/user/leaving_spot": release,
+    "POST /api/user/taking_spots": reserve_bulk,
+    "POST /api/user/leaving_spots": release_bulk,
+    "GET /api/user/booking_history": lambda c, ctx, i: c.get("/api/user/booking_history", headers=ctx.user(i)[1]),
+    "GET /api/user/summary": lambda c, ctx, i: c.get("/api/user/summary", headers=ctx.user(i)[1]),
+    "GET /api/user/export_csv": lambda c, ctx, i: c.get("/api/user/export_csv", headers=ctx.user(i)[1]),
+    "GET /api/admin/view_lots": lambda c, ctx, i: c.get("/api/admin/view_lots", headers=ctx.admin),
+    "GET /api/admin/view_users": lambda c, ctx, i: c.get("/api/admin/view_users", headers=ctx.admin),
+    "GET /api/admin/summary": lambda c, ctx, i: c.get("/api/admin/summary", headers=ctx.admin),
+    "GET /api/admin/dashboard": lambda c, ctx, i: c.get("/api/admin/dashboard", headers=ctx.admin),
+    "GET /api/admin/bookings": lambda c, ctx, i: c.get("/api/admin/bookings?limit=50", headers=ctx.admin),
+    "GET /api/admin/bookings?lot_id": lambda c, ctx, i: c.get(
+        f"/api/admin/bookings?limit=50&lot_id={ctx.lots[i % len(ctx.lots)]}", headers=ctx.admin),
+    "GET /api/admin/revenue_bylot": lambda c, ctx, i: c.get("/api/admin/revenue_bylot", headers=ctx.admin),
+    "GET /api/admin/export_csv": lambda c, ctx, i: c.get("/api/admin/export_csv", headers=ctx.admin),
+    "POST /api/admin/create_lot": create_lot,
+    "PUT /api/admin/edit_lot": lambda c, ctx, i: c.put(
+        f"/api/admin/edit_lot/{ctx.edit_lot_id}", json={"number_of_spots": 60 if i % 2 == 0 else 40}, headers=ctx.admin),
+    "DELETE /api/admin/delete_lot": delete_lot,
+    "POST /api/user/taking_spot|leaving_spot": reserve_or_release,
+}
+
+
+# ------------------------ Measurement ------------------------
+class StatementCounter:
+    """Counts SQL statements issued by the current thread between start() and stop()."""
+
+    def __init__(self, engine):
+        self._local = threading.local()
+        from sqlalchemy import event
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args, **kwargs):
+        if getattr(self._local, "active", False):
+            self._local.count += 1
+
+    def start(self):
+        self._local.active, self._local.count = True, 0
+
+    def stop(self):
+        self._local.active = False
+        return self._local.count
+
+
+def timed_call(client, counter, scenario, ctx, i):
+    counter.start()
+    started = time.perf_counter()
+    response = scenario(client, ctx, i)
+    response.get_data()   # drain streamed bodies (CSV) inside the timing
+    elapsed = time.perf_counter() - started
+    return elapsed * 1000, counter.stop(), response.status_code
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return round(sorted_values[index], 3)
+
+
+def summarize(samples, wall_seconds):
+    latencies = sorted(s[0] for s in samples)
+    return {
+        "requests": len(samples),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": round(latencies[-1], 3) if latencies else None,
+        "throughput_rps": round(len(samples) / wall_seconds, 1) if wall_seconds else None,
+        "sql_per_request": round(sum(s[1] for s in samples) / len(samples), 2) if samples else None,
+        "statuses": dict(Counter(str(s[2]) for s in samples))
+    }
+
+
+def run_sequential(app, counter, ctx, requests):
+    results = {}
+    client = app.test_client()
+    for label, scenario in SCENARIOS.items():
+        if "|" in label:
+            continue
+        scenario(client, ctx, requests)   # warm-up call, not measured
+        started = time.perf_counter()
+        samples = [timed_call(client, counter, scenario, ctx, i) for i in range(requests)]
+        results[label] = summarize(samples, time.perf_counter() - started)
+        print_row(label, results[label])
+    return results
+
+
+def run_load(app, counter, ctx, threads, seconds, seed):
+    labels, weights = zip(*LOAD_MIX.items())
+    samples = defaultdict(list)
+    deadline = time.perf_counter() + seconds
+    per_thread = max(1, len(ctx.users) // threads)
+
+    def worker(n):
+        rng = random.Random(seed + n)
+        client = app.test_client()
+        calls = Counter()
+        while time.perf_counter() < deadline:
+            label = rng.choices(labels, weights)[0]
+            # Each thread owns its own slice of users so reserve/release never race, and
+            # moves to the next user every second call so a reserve is followed by its release
+            user_index = n * per_thread + (calls[label] // 2) % per_thread
+            calls[label] += 1
+            samples[label].append(timed_call(client, counter, SCENARIOS[label], ctx, user_index))
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    wall = time.perf_counter() - started
+
+    results = {label: summarize(s, wall) for label, s in sorted(samples.items())}
+    results["overall"] = summarize([s for group in samples.values() for s in group], wall)
+    for label, row in results.items():
+        print_row(label, row)
+    return results
+
+
+def print_row(label, row):
+    print(f"{label:42s} {row['requests']:6d} req  p50 {row['p50_ms']:8.2f}  p95 {row['p95_ms']:8.2f}  "
+          f"p99 {row['p99_ms']:8.2f} ms  {row['throughput_rps']:8.1f} req/s  {row['sql_per_request']:6.1f} sql/req  "
+          f"{row['statuses']}")
+
+
+def compare(previous_path, results):
+    with open(previous_path) as f:
+        previous = json.load(f)
+    print(f"\ncompared with {previous['meta']['commit']} ({previous_path}): p50 / sql per request")
+    for mode in ("sequential", "load"):
+        for label, row in (results.get(mode) or {}).items():
+            old = (previous.get(mode) or {}).get(label)
+            if not old or not old["p50_ms"]:
+                continue
+            change = (row["p50_ms"] - old["p50_ms"]) / old["p50_ms"] * 100
+            print(f"{mode:10s} {label:42s} {old['p50_ms']:8.2f} -> {row['p50_ms']:8.2f} ms ({change:+6.1f}%)  "
+                  f"sql {old['sql_per_request']} -> {row['sql_per_request']}")
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lots", type=int, default=20)
+    parser.add_argument("--spots-per-lot", type=int, default=50)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--reservations", type=int, default=20000, help="historical completed bookings")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, default=50, help="calls per endpoint in the sequential pass")
+    parser.add_argument("--threads", type=int, default=0, help="concurrent clients for the load pass (0 = skip)")
+    parser.add_argument("--seconds", type=float, default=10, help="duration of the load pass")
+    parser.add_argument("--output", help="JSON results file (default bench_api-<commit>.json)")
+    parser.add_argument("--compare", help="earlier JSON results to diff against")
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_api.db")
+
+    import logging
+    warnings.filterwarnings("ignore", message="The HMAC key")          # default dev SECRET_KEY
+    logging.getLogger("controllers.cache").setLevel(logging.ERROR)   # Redis may be absent locally
+    from app import app, provision
+    from controllers.database import db
+    from controllers.models import ParkingLot
+    from controllers.availability import add_spots
+
+    provision(app)
+    # Streams end right after their opening frames: the scenario times auth, subscribe and snapshot
+    app.config["LOT_STREAM_MAX_SECONDS"] = 0
+    with app.app_context():
+        started = time.perf_counter()
+        user_ids, lot_ids = generate(db, args.lots, args.spots_per_lot, args.users, args.reservations, args.seed)
+        print(f"generated {args.lots} lots x {args.spots_per_lot} spots, {args.users} users, "
+              f"{args.reservations} reservations in {time.perf_counter() - started:.1f}s")
+
+        # A lot with no booking history, so edit_lot can shrink it again
+        edit_lot = ParkingLot(location_name="Bench Edit Lot", price=10, pin_code="560000", number_of_spots=50)
+        db.session.add(edit_lot)
+        db.session.flush()
+        add_spots(edit_lot.id, 50)
+        db.session.commit()
+
+        tokens = mint_tokens(user_ids)
+        admin = mint_tokens([1])[1]
+        ctx = Context(admin, [(uid, tokens[uid]) for uid in user_ids], lot_ids, edit_lot.id)
+        counter = StatementCounter(db.engine)
+        dialect = db.engine.dialect.name
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "database": dialect,
+            "python": platform.python_version(),
+            "dataset": {"lots": args.lots, "spots_per_lot": args.spots_per_lot, "users": args.users,
+                        "reservations": args.reservations, "seed": args.seed},
+            "requests": args.requests, "threads": args.threads, "seconds": args.seconds
+        }
+    }
+    print(f"\nsequential, {args.requests} calls per endpoint")
+    results["sequential"] = run_sequential(app, counter, ctx, args.requests)
+    if args.threads:
+        print(f"\nload, {args.threads} threads for {args.seconds}s")
+        results["load"] = run_load(app, counter, ctx, args.threads, args.seconds, args.seed)
+
+    output = args.output or f"bench_api-{results['meta']['commit']}.json"
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nresults written to {output}")
+    if args.compare:
+        compare(args.compare, results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
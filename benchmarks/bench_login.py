@@ -0,0 +1,80 @@
+"""Login throughput benchmark for /api/login.
+
+Creates users hashed under the configured policy, then logs them in from
+--threads concurrent clients for --seconds and reports logins/second overall and
+per CPU core.
+
+    python benchmarks/bench_login.py --threads 8 --seconds 10
+    PASSWORD_HASH_METHOD=pbkdf2:sha256:600000 python benchmarks/bench_login.py
+
+Uses a throwaway SQLite file unless DATABASE_URL is set.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--users", type=int, default=20)
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_login.db")
+
+    from app import app, provision
+    from controllers.database import db
+    from controllers.passwords import hash_password
+    from controllers.user_datastore import user_datastore
+
+    provision(app)
+
+    password = "bench-password"
+    with app.app_context():
+        user_role = user_datastore.find_or_create_role("user", description="Regular user role")
+        password_hash = hash_password(password)
+        names = []
+        for i in range(args.users):
+            name = f"bench{i}-{time.time_ns()}"
+            user_datastore.create_user(name=name, email=f"{name}@example.com", password=password_hash, roles=[user_role])
+            names.append(name)
+        db.session.commit()
+
+    statuses = Counter()
+    deadline = time.perf_counter() + args.seconds
+
+    def worker(offset):
+        client = app.test_client()
+        i = offset
+        while time.perf_counter() < deadline:
+            resp = client.post("/api/login", json={"username": names[i % len(names)], "password": password})
+            statuses[resp.status_code] += 1
+            i += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    cores = os.cpu_count() or 1
+    logins = statuses[200]
+    print(f"policy: {app.config['PASSWORD_HASH_METHOD']}  hash workers: {app.config['PASSWORD_HASH_WORKERS']}  "
+          f"threads: {args.threads}  cores: {cores}")
+    print("status codes:", dict(sorted(statuses.items())))
+    print(f"{logins / elapsed:.1f} logins/s total, {logins / elapsed / cores:.1f} logins/s per core")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
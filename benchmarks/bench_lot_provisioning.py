@@ -0,0 +1,62 @@
+"""Lot provisioning benchmark for /api/admin/create_lot and /api/admin/edit_lot.
+
+For each size, times creating a lot with that many spots, shrinking it to half
+and growing it back, all through the API.
+
+    python benchmarks/bench_lot_provisioning.py --sizes 100 1000 10000 100000
+
+Uses a throwaway SQLite file unless DATABASE_URL is set.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_lots.db")
+
+    from flask_jwt_extended import create_access_token
+    from app import app, provision
+    from controllers.models import ParkingSpot
+
+    provision(app)
+
+    with app.app_context():
+        headers = {"Authorization": "Bearer " + create_access_token(
+            identity="adminmail@gmail.com", additional_claims={"roles": ["admin"]})}
+    client = app.test_client()
+
+    def timed(call):
+        started = time.perf_counter()
+        resp = call()
+        elapsed = time.perf_counter() - started
+        if resp.status_code >= 400:
+            raise SystemExit(f"request failed: {resp.status_code} {resp.get_json()}")
+        return resp, elapsed
+
+    print(f"{'spots':>8} {'create':>10} {'shrink':>10} {'grow':>10}   (seconds)")
+    for size in args.sizes:
+        resp, create_s = timed(lambda: client.post("/api/admin/create_lot", headers=headers, json={
+            "location_name": f"Bench {size}", "price": 10, "pin_code": "000000", "number_of_spots": size}))
+        lot_id = resp.get_json()["lot_id"]
+        _, shrink_s = timed(lambda: client.put(f"/api/admin/edit_lot/{lot_id}", headers=headers,
+                                               json={"number_of_spots": size // 2}))
+        _, grow_s = timed(lambda: client.put(f"/api/admin/edit_lot/{lot_id}", headers=headers,
+                                             json={"number_of_spots": size}))
+        with app.app_context():
+            assert ParkingSpot.query.filter_by(lot_id=lot_id).count() == size
+        print(f"{size:>8} {create_s:>10.3f} {shrink_s:>10.3f} {grow_s:>10.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
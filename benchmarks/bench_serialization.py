@@ -0,0 +1,99 @@
+"""Serialization micro-benchmark for API response bodies.
+
+Builds an /api/admin/bookings-shaped payload of --rows reservations and times
+turning it into response bytes three ways:
+
+  baseline  .isoformat() per datetime field, then flask_restful's stdlib json.dumps
+  stdlib    controllers.serialization fallback (json with a datetime default)
+  orjson    controllers.serialization with orjson (skipped when not installed)
+
+then the gzip (and brotli, if installed) cost and size of the resulting body.
+
+    python benchmarks/bench_serialization.py --rows 100000 --repeat 5
+"""
+import argparse
+import gzip
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def payload(rows):
+    start = datetime(2024, 1, 1, 8, 0, 0, 123456)
+    reservations = []
+    for i in range(rows):
+        parked = start + timedelta(minutes=7 * i)
+        reservations.append({
+            "reservation_id": i + 1,
+            "user_name": f"user{i % 5000}",
+            "user_email": f"user{i % 5000}@example.com",
+            "lot_name": f"Lot {i % 40}",
+            "spot_id": i % 2000 + 1,
+            "parking_time": parked,
+            "exit_time": parked + timedelta(hours=2, minutes=i % 60) if i % 10 else None,
+            "status": "completed" if i % 10 else "active",
+            "parking_cost": round(20 + (i % 300) / 7, 2)
+        })
+    return {"all_reservations": reservations, "next_cursor": None}
+
+
+def baseline(data):
+    # What the resources did before: stringify every timestamp in a Python loop,
+    # then flask_restful's default representation (json.dumps + newline)
+    rows = [dict(row,
+                 parking_time=row["parking_time"].isoformat() if row["parking_time"] else None,
+                 exit_time=row["exit_time"].isoformat() if row["exit_time"] else None)
+            for row in data["all_reservations"]]
+    return (json.dumps(dict(data, all_reservations=rows)) + "\n").encode()
+
+
+def timed(fn, arg, repeat):
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(arg)
+        runs.append(time.perf_counter() - started)
+    return statistics.median(runs), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--gzip-level", type=int, default=6)
+    parser.add_argument("--brotli-quality", type=int, default=5)
+    args = parser.parse_args()
+
+    from controllers import serialization
+
+    data = payload(args.rows)
+    encoders = [("baseline", baseline), ("stdlib", serialization.stdlib_dumps)]
+    if serialization.orjson is not None:
+        encoders.append(("orjson", serialization.orjson_dumps))
+
+    print(f"{args.rows} reservations, median of {args.repeat} runs")
+    print(f"{'encoder':<10}{'ms':>10}{'bytes':>14}{'speedup':>10}")
+    body, reference = None, None
+    for name, encode in encoders:
+        seconds, body = timed(encode, data, args.repeat)
+        reference = reference or seconds
+        print(f"{name:<10}{seconds * 1000:>10.1f}{len(body):>14,}{reference / seconds:>9.1f}x")
+
+    compressors = [(f"gzip -{args.gzip_level}",
+                    lambda b: gzip.compress(b, compresslevel=args.gzip_level, mtime=0))]
+    if serialization.brotli is not None:
+        compressors.append((f"br q{args.brotli_quality}",
+                            lambda b: serialization.brotli.compress(b, quality=args.brotli_quality)))
+    print(f"\n{'encoding':<10}{'ms':>10}{'bytes':>14}{'ratio':>10}")
+    for name, squeeze in compressors:
+        seconds, packed = timed(squeeze, body, args.repeat)
+        print(f"{name:<10}{seconds * 1000:>10.1f}{len(packed):>14,}{len(body) / len(packed):>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
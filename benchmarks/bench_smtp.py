@@ -0,0 +1,86 @@
+"""SMTP throughput benchmark for mail.send_bulk_mail.
+
+Starts a local aiosmtpd sink server and sends the same batch twice: once with a
+fresh connection per message (how mail.send_mail used to work) and once through
+the pooled bulk API. Reports messages/second for each.
+
+    pip install aiosmtpd
+    python benchmarks/bench_smtp.py --messages 2000 --concurrency 4 --latency-ms 2
+
+--latency-ms delays every SMTP reply to imitate a remote server.
+"""
+import argparse
+import asyncio
+import os
+import smtplib
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class SinkHandler:
+    def __init__(self, latency):
+        self.latency = latency
+        self.received = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        await asyncio.sleep(self.latency)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(self.latency)
+        self.received += 1
+        return "250 OK"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    try:
+        from aiosmtpd.controller import Controller
+    except ImportError:
+        raise SystemExit("aiosmtpd is required: pip install aiosmtpd")
+    from mail import build_message, send_bulk_mail, FROM_EMAIL
+
+    handler = SinkHandler(args.latency_ms / 1000)
+    port = free_port()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    messages = [(f"user{i}@example.com", "Benchmark", f"Message {i}") for i in range(args.messages)]
+
+    try:
+        started = time.perf_counter()
+        for message in messages:
+            with smtplib.SMTP("127.0.0.1", port) as server:
+                server.sendmail(FROM_EMAIL, [message[0]], build_message(*message).as_string())
+        per_message = time.perf_counter() - started
+
+        started = time.perf_counter()
+        results = send_bulk_mail(messages, concurrency=args.concurrency, host="127.0.0.1", port=port)
+        pooled = time.perf_counter() - started
+    finally:
+        controller.stop()
+
+    failed = sum(1 for r in results if not r.ok)
+    print(f"{args.messages} messages, {args.latency_ms}ms simulated server latency")
+    print(f"connection per message: {args.messages / per_message:8.1f} msg/s")
+    print(f"pooled x{args.concurrency}:           {args.messages / pooled:8.1f} msg/s  ({failed} failed)")
+    print(f"server received {handler.received} messages")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
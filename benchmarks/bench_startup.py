@@ -0,0 +1,83 @@
+"""Cold-start benchmark for app.py.
+
+Provisions a scratch database once, then starts --runs fresh interpreters. Each
+one imports app.py and serves one authenticated request. Reports median and max
+for the import time and the first-request latency, plus the one-off provision
+time for comparison.
+
+    python benchmarks/bench_startup.py --runs 10
+    python benchmarks/bench_startup.py --path /api/user/view_lots
+
+Uses a throwaway SQLite file unless DATABASE_URL is set.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Runs in a fresh interpreter so nothing is warm from a previous run
+CHILD = """
+import json, sys, time, warnings
+warnings.filterwarnings("ignore")
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+from app import app
+imported = time.perf_counter()
+
+from flask_jwt_extended import create_access_token
+from controllers.user_datastore import user_datastore
+with app.app_context():
+    admin = user_datastore.find_user(email="adminmail@gmail.com")
+    token = create_access_token(identity=admin.email, additional_claims={{
+        "roles": [r.name for r in admin.roles], "token_uniquifier": admin.fs_token_uniquifier}})
+
+client = app.test_client()
+requested = time.perf_counter()
+response = client.get({path!r}, headers={{"Authorization": "Bearer " + token}})
+done = time.perf_counter()
+print(json.dumps({{"import": imported - started, "first_request": done - requested,
+                  "status": response.status_code, "tasks_loaded": "tasks" in sys.modules}}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/api/admin/view_lots")
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_startup.db")
+
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "from app import app, provision; provision(app)"],
+                   cwd=ROOT, check=True, capture_output=True)
+    provision_time = time.perf_counter() - started
+
+    samples = []
+    for _ in range(args.runs):
+        out = subprocess.run([sys.executable, "-c", CHILD.format(root=ROOT, path=args.path)],
+                             cwd=ROOT, check=True, capture_output=True, text=True).stdout
+        samples.append(json.loads(out.strip().splitlines()[-1]))
+
+    statuses = sorted({s["status"] for s in samples})
+    print(f"{args.runs} cold starts, first request GET {args.path} -> {statuses}")
+    for key in ("import", "first_request"):
+        values = [s[key] * 1000 for s in samples]
+        print(f"{key:14s} median {statistics.median(values):8.1f} ms   max {max(values):8.1f} ms")
+    print(f"{'provision':14s} once   {provision_time * 1000:8.1f} ms (separate deploy step)")
+    if any(s["tasks_loaded"] for s in samples):
+        print("warning: tasks.py was imported on the web path")
+        return 1
+    return 0 if statuses == [200] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,64 @@
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_process_init, worker_process_shutdown
 from datetime import timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from controllers.config import Config
 import os
 
 celery_app = Celery(
     "MAD2",
-    broker="redis://localhost:6380/0",
-    backend="redis://localhost:6380/0"
+    broker=Config.REDIS_URL,
+    backend=Config.REDIS_URL,
+    include=["tasks"]   # loaded by the worker; importing tasks.py imports this module, not the reverse
 )
 
+INSTANCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance")
+
+_engine = None
+
+
+# ------------------------ Database engine ------------------------
+def database_url():
+    """Config.SQLALCHEMY_DATABASE_URI, with a relative SQLite path resolved against
+    instance/ the same way Flask-SQLAlchemy does for the web app."""
+    url = make_url(Config.SQLALCHEMY_DATABASE_URI)
+    if url.get_backend_name() == "sqlite" and url.database and url.database != ":memory:" \
+            and not os.path.isabs(url.database):
+        url = url.set(database=os.path.join(INSTANCE_DIR, url.database))
+    return url
+
+
+def get_engine():
+    """The process-wide engine: built once per worker process, then shared by every task."""
+    global _engine
+    if _engine is None:
+        _engine = create_engine(
+            database_url(),
+            pool_size=Config.WORKER_DB_POOL_SIZE,
+            max_overflow=Config.WORKER_DB_MAX_OVERFLOW,
+            pool_recycle=Config.WORKER_DB_POOL_RECYCLE,
+            pool_pre_ping=True
+        )
+    return _engine
+
+
+@worker_process_init.connect
+def init_worker_engine(**kwargs):
+    # A pool inherited across fork shares sockets with the parent: drop those
+    # connections without closing them, then start this child's own pool
+    if _engine is not None:
+        _engine.dispose(close=False)
+    get_engine()
+
+
+@worker_process_shutdown.connect
+def dispose_worker_engine(**kwargs):
+    if _engine is not None:
+        _engine.dispose()
+
 os.environ.setdefault('FORKED_BY_MULTIPROCESSING', '1')
-celery_app.loader.import_default_modules()
-import tasks  # Register tasks
 
 # TESTING SCHEDULE - 10s Daily, 20s Monthly
 celery_app.conf.beat_schedule = {
@@ -23,6 +70,10 @@ celery_app.conf.beat_schedule = {
         "task": "tasks.send_monthly_parking_report",
         "schedule": timedelta(seconds=20),  # HAR 20 SECOND!
     },
+    "archive-reservations": {
+        "task": "tasks.archive_reservations",
+        "schedule": crontab(hour=3, minute=0),
+    },
 }
 
 celery_app.conf.timezone = 'Asia/Kolkata'
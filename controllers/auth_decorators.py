@@ -1,22 +1,115 @@
 from functools import wraps
-from flask import jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from collections import OrderedDict, namedtuple
+from threading import Lock
+import time
+from flask import jsonify, g, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt, get_jwt_request_location
 from controllers.models import User
 
 
+# Claim marking a short-lived token that only opens the lot stream (User_LotStreamToken)
+STREAM_TOKEN_SCOPE = "lot-stream"
+
+
+# ------------------------ Identity cache ------------------------
+# Just what authorization needs; handlers read it from g.current_user
+CurrentUser = namedtuple("CurrentUser", "id name email roles active token_uniquifier")
+
+
+class IdentityCache:
+    """Small thread-safe LRU of CurrentUser entries, each valid for `ttl` seconds."""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, email):
+        with self._lock:
+            entry = self._entries.get(email)
+            if not entry:
+                return None
+            expires_at, user = entry
+            if expires_at < time.monotonic():
+                del self._entries[email]
+                return None
+            self._entries.move_to_end(email)
+            return user
+
+    def put(self, user, ttl, maxsize):
+        with self._lock:
+            self._entries[user.email] = (time.monotonic() + ttl, user)
+            self._entries.move_to_end(user.email)
+            while len(self._entries) > maxsize:
+                self._entries.popitem(last=False)
+
+
+identity_cache = IdentityCache()
+
+
+def _load_identity(email):
+    user = User.query.filter_by(email=email).first()
+    if not user:
+        return None
+    return CurrentUser(
+        id=user.id,
+        name=user.name,
+        email=user.email,
+        roles=tuple(r.name for r in user.roles),
+        active=user.active,
+        token_uniquifier=user.fs_token_uniquifier
+    )
+
+
+def resolve_current_user():
+    """Resolve the JWT identity once per request and store it on g.current_user.
+
+    Served from identity_cache when the token's uniquifier claim matches the cached
+    one, so the common case touches no database. A mismatch forces a reload, and a
+    token whose uniquifier doesn't match the reloaded user is treated as revoked.
+    Entries are per process and never invalidated, so a rotated uniquifier or a
+    deactivated account may keep being accepted for up to IDENTITY_CACHE_TTL seconds.
+    """
+    if "current_user" in g:
+        return g.current_user
+
+    email = get_jwt_identity()
+    token_uniquifier = get_jwt().get("token_uniquifier")
+
+    user = identity_cache.get(email)
+    if user is None or (token_uniquifier and user.token_uniquifier != token_uniquifier):
+        user = _load_identity(email)
+        if user is not None:
+            identity_cache.put(
+                user,
+                ttl=current_app.config["IDENTITY_CACHE_TTL"],
+                maxsize=current_app.config["IDENTITY_CACHE_SIZE"]
+            )
+
+    if user is not None and (not user.active or (token_uniquifier and user.token_uniquifier != token_uniquifier)):
+        user = None
+    g.current_user = user
+    return user
+
+
+def _token_roles(user):
+    # LoginAPI embeds the roles in the token; older tokens fall back to the cached roles
+    return get_jwt().get("roles") or user.roles
+
+
 # ------------------------ Admin role required ------------------------
 def admin_required(f):
     @wraps(f)
     @jwt_required()   # Flask-JWT-Extended authenticates token
     def decorated(*args, **kwargs):
-        user_email = get_jwt_identity()  # Extract "sub" from JWT
-        user = User.query.filter_by(email=user_email).first()
+        user = resolve_current_user()
 
         if not user:
             return {"message": "User not found for this token"}, 401
+        if get_jwt().get("scope"):
+            return {"message": "This token is only valid for the lot stream"}, 401
 
         # Check role
-        if "admin" not in [role.name for role in user.roles]:
+        if "admin" not in _token_roles(user):
             return {"message": "Admin role required"}, 403
 
         return f(*args, **kwargs)
@@ -26,17 +119,33 @@ def admin_required(f):
 
 
 # ------------------------ User role required ------------------------
-from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity as flask_get_jwt_identity
-def user_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        try:
-            verify_jwt_in_request()  # ensures a valid JWT is present
-            user_email = flask_get_jwt_identity()
-            user = User.query.filter_by(email=user_email).first()
-            if not user or "user" not in [role.name for role in user.roles]:
+from flask_jwt_extended import verify_jwt_in_request
+def _user_required(locations=None, scope=None):
+    """`scope`: the one scoped token this endpoint takes besides normal access tokens;
+    tokens sent in the query string must carry it, so full tokens never land in URLs."""
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            try:
+                verify_jwt_in_request(locations=locations)  # ensures a valid JWT is present
+            except Exception as e:
+                return {"message": str(e)}, 401
+            token_scope = get_jwt().get("scope")
+            if token_scope and token_scope != scope:
+                return {"message": "This token is only valid for the lot stream"}, 401
+            if get_jwt_request_location() == "query_string" and token_scope != scope:
+                return {"message": "Pass a stream token from /api/user/lots/stream_token in the URL"}, 401
+            user = resolve_current_user()
+            if not user:
+                return {"message": "User not found for this token"}, 401
+            if "user" not in _token_roles(user):
                 return {"message": "User role required"}, 403
             return f(*args, **kwargs)
-        except Exception as e:
-            return {"message": str(e)}, 401
-    return decorated
+        return decorated
+    return decorator
+
+
+user_required = _user_required()
+
+# EventSource can't send headers, so the lot stream also accepts ?jwt=<stream token>
+stream_user_required = _user_required(["headers", "query_string"], scope=STREAM_TOKEN_SCOPE)
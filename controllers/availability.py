@@ -0,0 +1,199 @@
+from sqlalchemy import select, update, insert, delete, exists, func
+from controllers.database import db
+from controllers.cache import invalidate_tags
+from controllers.lot_events import publish_lot_change
+from controllers.models import ParkingLot, ParkingSpot, Reservation, ArchivedReservation
+
+
+# ------------------------ Lot counters ------------------------
+def adjust_lot_counters(lot_id, available_delta=0, occupied_delta=0):
+    """Shift a lot's counters in SQL (not Python) so concurrent writers never lose an update.
+    Runs inside the caller's transaction; the caller commits."""
+    ParkingLot.query.filter_by(id=lot_id).update({
+        ParkingLot.available_spots: ParkingLot.available_spots + available_delta,
+        ParkingLot.occupied_spots: ParkingLot.occupied_spots + occupied_delta,
+        ParkingLot.revision: ParkingLot.revision + 1,
+    }, synchronize_session=False)
+
+
+def recount_lot_counters(lot_id=None):
+    """Recompute counters from parking_spots (repair path), then announce every recounted
+    lot so ETags, cached bodies and streams drop the old counts. Returns the number of
+    lots updated."""
+    def count_with_status(status):
+        return (
+            select(func.count(ParkingSpot.id))
+            .where(ParkingSpot.lot_id == ParkingLot.id, ParkingSpot.current_status == status)
+            .scalar_subquery()
+        )
+
+    query = ParkingLot.query
+    if lot_id is not None:
+        query = query.filter_by(id=lot_id)
+    updated = query.update({
+        ParkingLot.available_spots: count_with_status("A"),
+        ParkingLot.occupied_spots: count_with_status("O"),
+        ParkingLot.revision: ParkingLot.revision + 1,
+    }, synchronize_session=False)
+    db.session.commit()
+
+    recounted_ids = select(ParkingLot.id)
+    if lot_id is not None:
+        recounted_ids = recounted_ids.where(ParkingLot.id == lot_id)
+    for recounted in db.session.scalars(recounted_ids).all():
+        # Which spots disagreed is unknown, so delta clients get the whole lot again
+        publish_lot_change(recounted, layout=True)
+    invalidate_tags("lots", "users")
+    return updated
+
+
+# ------------------------ Provisioning ------------------------
+def add_spots(lot_id, count):
+    """Insert `count` free spots as one batched INSERT inside the caller's transaction."""
+    if count > 0:
+        db.session.execute(insert(ParkingSpot), [{"lot_id": lot_id, "current_status": "A"} for _ in range(count)])
+
+
+def remove_free_spots(lot_id, count):
+    """Delete up to `count` free spots (highest ids first) with one set-based DELETE and
+    return how many went. Spots with booking history (hot or archived) are kept so
+    reservations never lose their spot; the caller rolls back if fewer than `count`
+    could be removed."""
+    if count <= 0:
+        return 0
+    removable = (
+        select(ParkingSpot.id)
+        .where(
+            ParkingSpot.lot_id == lot_id,
+            ParkingSpot.current_status == "A",
+            ~exists().where(Reservation.spot_id == ParkingSpot.id),
+            ~exists().where(ArchivedReservation.spot_id == ParkingSpot.id)
+        )
+        .order_by(ParkingSpot.id.desc())
+        .limit(count)
+    )
+    if db.session.get_bind().dialect.name == "postgresql":
+        # Skip spots a concurrent claim holds instead of waiting on them while this
+        # transaction already holds the lot row: claims lock spots first, then the lot
+        removable = removable.with_for_update(skip_locked=True)
+    # Re-check the status on the outer DELETE: a spot claimed meanwhile must survive
+    return db.session.execute(
+        delete(ParkingSpot)
+        .where(ParkingSpot.id.in_(removable), ParkingSpot.current_status == "A")
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+# ------------------------ Spot allocation ------------------------
+MAX_CLAIM_ATTEMPTS = 5
+
+
+class SpotAllocationConflict(Exception):
+    """Every candidate spot was taken by concurrent requests before we could claim one."""
+
+
+def claim_spot(lot_id):
+    """Atomically flip the lowest free spot of a lot to occupied and return its id,
+    or None when the lot is full. Runs inside the caller's transaction.
+
+    PostgreSQL locks the candidate row with FOR UPDATE SKIP LOCKED, so concurrent
+    requests each get a different spot without queueing on the same row. Other
+    databases (SQLite) use an optimistic compare-and-set with bounded retry."""
+    candidate = (
+        select(ParkingSpot.id)
+        .where(ParkingSpot.lot_id == lot_id, ParkingSpot.current_status == "A")
+        .order_by(ParkingSpot.id.asc())
+        .limit(1)
+    )
+
+    if db.session.get_bind().dialect.name == "postgresql":
+        spot_id = db.session.execute(candidate.with_for_update(skip_locked=True)).scalar()
+        if spot_id is None:
+            return None
+        db.session.execute(
+            update(ParkingSpot).where(ParkingSpot.id == spot_id).values(current_status="O")
+        )
+        return spot_id
+
+    for _ in range(MAX_CLAIM_ATTEMPTS):
+        spot_id = db.session.execute(candidate).scalar()
+        if spot_id is None:
+            return None
+        claimed = db.session.execute(
+            update(ParkingSpot)
+            .where(ParkingSpot.id == spot_id, ParkingSpot.current_status == "A")
+            .values(current_status="O")
+        ).rowcount
+        if claimed:
+            return spot_id
+    raise SpotAllocationConflict()
+
+
+def _occupy(spot_ids):
+    """Flip whichever of these spots are still free to occupied; returns the ids flipped."""
+    return db.session.execute(
+        update(ParkingSpot)
+        .where(ParkingSpot.id.in_(spot_ids), ParkingSpot.current_status == "A")
+        .values(current_status="O")
+        .returning(ParkingSpot.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+
+
+def _first_free_run(lot_id, count):
+    """First id of the lowest run of `count` consecutive free spot ids in a lot, or None.
+    Consecutive ids share id - ROW_NUMBER() over the free spots in id order."""
+    free = (
+        select(
+            ParkingSpot.id,
+            (ParkingSpot.id - func.row_number().over(order_by=ParkingSpot.id)).label("run")
+        )
+        .where(ParkingSpot.lot_id == lot_id, ParkingSpot.current_status == "A")
+        .subquery()
+    )
+    first = func.min(free.c.id)
+    return db.session.execute(
+        select(first).group_by(free.c.run).having(func.count() >= count).order_by(first).limit(1)
+    ).scalar()
+
+
+def claim_spots(lot_id, count, contiguous=False):
+    """Atomically flip up to `count` free spots of a lot (lowest ids first) to occupied
+    and return their ids, fewer when the lot has fewer free. With contiguous=True it is
+    exactly `count` consecutive spot ids or none. Runs inside the caller's transaction;
+    the caller rolls back when the result falls short.
+
+    PostgreSQL locks the free spots with FOR UPDATE SKIP LOCKED, as claim_spot does.
+    Otherwise (and for contiguous runs, which must not skip) spots taken between the
+    SELECT and the UPDATE are detected from UPDATE ... RETURNING and looked up again."""
+    if contiguous:
+        for _ in range(MAX_CLAIM_ATTEMPTS):
+            first = _first_free_run(lot_id, count)
+            if first is None:
+                return []
+            run = list(range(first, first + count))
+            claimed = _occupy(run)
+            if len(claimed) == count:
+                return run
+            # Lost part of the run to a concurrent request: hand ours back and look again
+            db.session.execute(update(ParkingSpot).where(ParkingSpot.id.in_(claimed)).values(current_status="A"))
+        raise SpotAllocationConflict()
+
+    postgres = db.session.get_bind().dialect.name == "postgresql"
+    claimed = []
+    for _ in range(MAX_CLAIM_ATTEMPTS):
+        candidates = (
+            select(ParkingSpot.id)
+            .where(ParkingSpot.lot_id == lot_id, ParkingSpot.current_status == "A")
+            .order_by(ParkingSpot.id.asc())
+            .limit(count - len(claimed))
+        )
+        if postgres:
+            candidates = candidates.with_for_update(skip_locked=True)
+        spot_ids = db.session.execute(candidates).scalars().all()
+        if not spot_ids:
+            return sorted(claimed)
+        claimed += _occupy(spot_ids)
+        if len(claimed) == count:
+            return sorted(claimed)
+    raise SpotAllocationConflict()
@@ -0,0 +1,192 @@
+import logging
+import time
+from functools import wraps
+import redis
+from flask import g, request, current_app, Response
+from werkzeug.http import unquote_etag
+from controllers.database import redis_client, redis_raw_client
+from controllers.metrics import CACHE_REQUESTS
+from controllers.serialization import dumps, loads, compress, compressible, negotiate_encoding, json_response
+
+log = logging.getLogger(__name__)
+
+
+# ------------------------ Shared JSON cache ------------------------
+# Values live in Redis so every gunicorn worker shares one copy. Redis being down
+# is never an error for the caller: reads miss and writes are skipped.
+def cache_get(key):
+    try:
+        raw = redis_client.get(key)
+    except redis.RedisError as e:
+        log.warning("cache read failed for %s: %s", key, e)
+        return None
+    return loads(raw) if raw is not None else None
+
+
+def cache_set(key, value, ttl):
+    try:
+        redis_client.set(key, dumps(value), ex=ttl)
+    except redis.RedisError as e:
+        log.warning("cache write failed for %s: %s", key, e)
+
+
+def cache_delete(*keys):
+    try:
+        redis_client.delete(*keys)
+    except redis.RedisError as e:
+        log.warning("cache delete failed for %s: %s", keys, e)
+
+
+# ------------------------ Response cache ------------------------
+# Keys embed the current version of each tag, so invalidation is one INCR per tag:
+# older entries become unreachable and expire on their TTL.
+LOCK_MS = 2000           # a recomputation holds the key's lock at most this long
+LOCK_WAIT = 1.0          # seconds other workers wait for that recomputation
+LOCK_POLL = 0.025
+
+
+def invalidate_tags(*tags):
+    """Call after publish_lot_change(): a body cached in between would otherwise
+    be stored next to the pre-write availability ETag and answer stale 304s."""
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for tag in tags:
+            pipe.incr(f"tag:{tag}")
+        pipe.execute()
+    except redis.RedisError as e:
+        log.warning("cache invalidation failed for %s: %s", tags, e)
+
+
+def _response_key(name, scope, tags):
+    versions = redis_client.mget([f"tag:{tag}" for tag in tags]) if tags else []
+    if scope == "user":
+        who = f"user:{g.current_user.id}"
+    elif scope == "role":
+        who = "role:" + ",".join(sorted(g.current_user.roles))
+    else:
+        who = "all"
+    args = "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+    return f"resp:{name}:{who}:{'.'.join(v or '0' for v in versions)}:{args}"
+
+
+# An entry is a Redis hash: the headers, the dumps() body ("identity") and that
+# body per content-coding, added the first time a client asks for it. Hits send
+# the stored bytes as they are.
+_add_encoding_script = redis_raw_client.register_script("""
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+end
+""")
+
+
+def _to_entry(result):
+    """Cacheable form of a resource's 200 (body, status[, headers]) result, else None."""
+    if not isinstance(result, tuple) or len(result) < 2 or result[1] != 200:
+        return None
+    return {"headers": dict(result[2]) if len(result) > 2 else {}, "identity": dumps(result[0])}
+
+
+def _entry_fields(encoding):
+    return ["headers", "identity"] + ([encoding] if encoding else [])
+
+
+def _read_entry(key, encoding):
+    """The entry under `key` (with its `encoding` body when already stored), or None."""
+    try:
+        values = redis_raw_client.hmget(key, _entry_fields(encoding))
+    except redis.RedisError as e:
+        log.warning("cache read failed for %s: %s", key, e)
+        return None
+    if values[0] is None:
+        return None
+    return dict(zip(_entry_fields(encoding), values), headers=loads(values[0]))
+
+
+def _save_entry(key, entry, ttl):
+    try:
+        pipe = redis_raw_client.pipeline()
+        pipe.hset(key, mapping={"headers": dumps(entry["headers"]), "identity": entry["identity"]})
+        pipe.expire(key, ttl)
+        pipe.execute()
+    except redis.RedisError as e:
+        log.warning("cache write failed for %s: %s", key, e)
+
+
+def _encoded_body(key, entry):
+    """The entry's body for this request and its encoding: compressed once per
+    content-coding and stored next to the identity body for later hits."""
+    body = entry["identity"]
+    encoding = compressible(body)
+    if not encoding:
+        return body, None
+    if entry.get(encoding) is None:
+        entry[encoding] = compress(body, encoding)
+        try:
+            _add_encoding_script(keys=[key], args=[encoding, entry[encoding]])
+        except redis.RedisError as e:
+            log.warning("cache write failed for %s: %s", key, e)
+    return entry[encoding], encoding
+
+
+def _replay(key, entry, outcome):
+    headers = dict(entry["headers"], **{"X-Cache": outcome})
+    etag = headers.get("ETag")
+    if etag and request.if_none_match.contains_weak(unquote_etag(etag)[0]):
+        return Response(status=304, headers=headers)
+    body, encoding = _encoded_body(key, entry)
+    return json_response(body, 200, headers, encoding)
+
+
+def _wait_for(key, encoding):
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL)
+        entry = _read_entry(key, encoding)
+        if entry is not None:
+            return entry
+    return None
+
+
+def cached_response(name, ttl_setting, tags=(), scope="role"):
+    """Serve a flask_restful GET from one copy shared by every worker.
+
+    Goes under the auth decorator (it reads g.current_user). `scope` picks who shares
+    an entry: "role" (same roles, same body), "user" or "all". `ttl_setting` names the
+    config key holding the TTL; `tags` are bumped by invalidate_tags() from writes.
+    On a miss only one worker recomputes; the rest wait briefly for its result.
+    Redis errors fall through to the uncached view."""
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            encoding = negotiate_encoding()
+            try:
+                key = _response_key(name, scope, tags)
+                entry = _read_entry(key, encoding)
+                if entry is not None:
+                    CACHE_REQUESTS.inc((name, "hit"))
+                    return _replay(key, entry, "HIT")
+                locked = redis_client.set(f"lock:{key}", 1, nx=True, px=LOCK_MS)
+            except redis.RedisError as e:
+                log.warning("response cache unavailable for %s: %s", name, e)
+                CACHE_REQUESTS.inc((name, "bypass"))
+                return f(*args, **kwargs)
+
+            if not locked:
+                entry = _wait_for(key, encoding)
+                if entry is not None:
+                    CACHE_REQUESTS.inc((name, "hit"))
+                    return _replay(key, entry, "HIT")
+
+            CACHE_REQUESTS.inc((name, "miss"))
+            try:
+                result = f(*args, **kwargs)
+                entry = _to_entry(result)
+                if entry is not None:
+                    _save_entry(key, entry, current_app.config[ttl_setting])
+                    return _replay(key, entry, "MISS")
+                return result
+            finally:
+                if locked:
+                    cache_delete(f"lock:{key}")
+        return decorated
+    return decorator
@@ -27,12 +27,23 @@ class Config:
     SECURITY_PASSWORD_SINGLE_HASH = False
     SECURITY_JOIN_USER_ROLES = "user_roles"
 
+    # Werkzeug method string for user passwords; hashes made with anything else
+    # are upgraded on the user's next successful login
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))    # hashing threads per process
+    PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", 16))       # hashes running or waiting
+    PASSWORD_HASH_WAIT = float(os.getenv("PASSWORD_HASH_WAIT", 2))        # seconds before answering 503
+
     # =======================
     # JWT
     # =======================
     JWT_SECRET_KEY = SECRET_KEY
     JWT_ACCESS_TOKEN_EXPIRES = 3600  # 1 hour
 
+    # Per-process cache of token identity -> user id/roles/active
+    IDENTITY_CACHE_TTL = int(os.getenv("IDENTITY_CACHE_TTL", 60))        # seconds
+    IDENTITY_CACHE_SIZE = int(os.getenv("IDENTITY_CACHE_SIZE", 10000))   # entries
+
     # =======================
     # Redis + Celery
     # =======================
@@ -41,6 +52,46 @@ class Config:
     broker_url = REDIS_URL
     result_backend = REDIS_URL
 
+    # Connection pool of the one engine each Celery worker process shares
+    WORKER_DB_POOL_SIZE = int(os.getenv("WORKER_DB_POOL_SIZE", 5))
+    WORKER_DB_MAX_OVERFLOW = int(os.getenv("WORKER_DB_MAX_OVERFLOW", 5))
+    WORKER_DB_POOL_RECYCLE = int(os.getenv("WORKER_DB_POOL_RECYCLE", 1800))   # seconds
+
+    # Seconds an /api/admin/dashboard snapshot is shared across workers
+    DASHBOARD_CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", 10))
+    # Shared response cache (controllers/cache.py); writes invalidate entries sooner
+    LOTS_CACHE_TTL = int(os.getenv("LOTS_CACHE_TTL", 30))      # lot listings
+    USERS_CACHE_TTL = int(os.getenv("USERS_CACHE_TTL", 60))    # admin user list
+    # Upper bound on a cached /api/user/summary; reserve/release invalidate it sooner
+    USER_SUMMARY_CACHE_TTL = int(os.getenv("USER_SUMMARY_CACHE_TTL", 300))
+
+    # Most spots one /api/user/taking_spots or leaving_spots call may reserve or release
+    BULK_RESERVE_MAX = int(os.getenv("BULK_RESERVE_MAX", 100))
+
+    # Completed reservations older than this move to reservations_archive (tasks.archive_reservations)
+    ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", 90))
+    ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", 1000))     # rows moved per transaction
+    ARCHIVE_MAX_BATCHES = int(os.getenv("ARCHIVE_MAX_BATCHES", 100))    # per run; the next run continues
+
+    # Live lot availability stream (/api/user/lots/stream)
+    LOT_EVENTS_KEEP = int(os.getenv("LOT_EVENTS_KEEP", 1000))                 # events kept for resuming clients
+    LOT_STREAM_HEARTBEAT = int(os.getenv("LOT_STREAM_HEARTBEAT", 15))         # seconds between keepalives
+    LOT_STREAM_MAX_SECONDS = int(os.getenv("LOT_STREAM_MAX_SECONDS", 300))    # then the client reconnects and resumes
+    LOT_STREAM_TOKEN_TTL = int(os.getenv("LOT_STREAM_TOKEN_TTL", 60))         # seconds a ?jwt= stream token can open a stream
+
+    # =======================
+    # API responses (controllers/serialization.py)
+    # =======================
+    RESPONSE_COMPRESS_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", 1024))   # smaller JSON bodies go out as-is
+    RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", 6))
+    RESPONSE_BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", 5))             # only with the brotli package
+
+    # =======================
+    # Metrics (/metrics)
+    # =======================
+    METRICS_DB_HEADERS = os.getenv("METRICS_DB_HEADERS", "0") == "1"   # echo X-DB-Queries / X-DB-Time
+    QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", 20))                   # warn above this many statements per request, 0 = off
+
     # =======================
     # Mail (Environment only)
     # =======================
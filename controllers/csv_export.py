@@ -0,0 +1,45 @@
+import csv
+from io import StringIO
+from flask import Response, stream_with_context
+from controllers.database import db
+
+FETCH_BATCH = 1000     # rows pulled per round trip from the server-side cursor
+FLUSH_EVERY = 500      # rows buffered before a chunk is sent to the client
+
+
+# ------------------------ Streaming CSV ------------------------
+def iter_csv(header, query, row_to_values):
+    """Yield CSV text chunks while the query is still being fetched, so memory stays
+    bounded by FLUSH_EVERY rows no matter how large the export is."""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(header)
+    yield _drain(buffer)   # send the header before the first row is fetched
+
+    rows = db.session.execute(query.execution_options(yield_per=FETCH_BATCH))
+    pending = 0
+    for row in rows:
+        writer.writerow(row_to_values(row))
+        pending += 1
+        if pending >= FLUSH_EVERY:
+            yield _drain(buffer)
+            pending = 0
+    if pending:
+        yield _drain(buffer)
+
+
+def _drain(buffer):
+    chunk = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate(0)
+    return chunk
+
+
+def csv_response(filename, chunks):
+    """Wrap a chunk generator in a streaming attachment response."""
+    return Response(
+        stream_with_context(chunks),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -0,0 +1,78 @@
+import time
+from datetime import datetime
+from sqlalchemy import select, func
+from controllers.database import db
+from controllers.models import User, ParkingLot, Reservation, RevenueRollup
+from controllers.cache import cache_get, cache_set
+
+DASHBOARD_CACHE_KEY = "admin:dashboard"
+
+
+# ------------------------ Aggregates ------------------------
+def dashboard_summary():
+    """All summary totals in one round trip (scalar subqueries, no row loading)."""
+    row = db.session.execute(select(
+        select(func.count(ParkingLot.id)).scalar_subquery().label("total_lots"),
+        select(func.coalesce(func.sum(ParkingLot.number_of_spots), 0)).scalar_subquery().label("total_spots"),
+        select(func.coalesce(func.sum(ParkingLot.occupied_spots), 0)).scalar_subquery().label("occupied_spots"),
+        select(func.count(Reservation.id)).where(Reservation.current_status == "active")
+            .scalar_subquery().label("active_users"),
+        select(func.count(User.id)).scalar_subquery().label("total_users"),
+        select(func.coalesce(func.sum(RevenueRollup.revenue), 0)).scalar_subquery().label("total_revenue"),
+    )).one()
+    return {
+        "total_lots": row.total_lots,
+        "total_spots": row.total_spots,
+        "occupied_spots": row.occupied_spots,
+        "available_spots": row.total_spots - row.occupied_spots,
+        "active_users": row.active_users,
+        "total_users": row.total_users,
+        "total_revenue": round(row.total_revenue, 2)
+    }
+
+
+def dashboard_lots():
+    """Per-lot occupancy and lifetime revenue: lots LEFT JOIN their rollup totals."""
+    revenue = (
+        select(RevenueRollup.lot_id, func.sum(RevenueRollup.revenue).label("revenue"))
+        .group_by(RevenueRollup.lot_id)
+        .subquery()
+    )
+    rows = db.session.execute(
+        select(
+            ParkingLot.id, ParkingLot.location_name, ParkingLot.price, ParkingLot.number_of_spots,
+            ParkingLot.available_spots, ParkingLot.occupied_spots, revenue.c.revenue
+        )
+        .outerjoin(revenue, revenue.c.lot_id == ParkingLot.id)
+        .order_by(ParkingLot.id)
+    )
+    return [{
+        "lot_id": row.id,
+        "location_name": row.location_name,
+        "price": row.price,
+        "total_spots": row.number_of_spots,
+        "available_spots": row.available_spots,
+        "occupied_spots": row.occupied_spots,
+        "revenue": round(row.revenue or 0, 2)
+    } for row in rows]
+
+
+# ------------------------ Snapshot ------------------------
+def dashboard_snapshot(ttl):
+    """The whole admin dashboard, shared by every worker through Redis for `ttl` seconds."""
+    snapshot = cache_get(DASHBOARD_CACHE_KEY)
+    if snapshot is not None:
+        snapshot["cached"] = True
+        return snapshot
+
+    started = time.perf_counter()
+    snapshot = {
+        "summary": dashboard_summary(),
+        "lots": dashboard_lots(),
+        "generated_at": datetime.utcnow().isoformat(),
+        "computation_ms": None
+    }
+    snapshot["computation_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    cache_set(DASHBOARD_CACHE_KEY, snapshot, ttl)
+    snapshot["cached"] = False
+    return snapshot
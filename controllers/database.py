@@ -1,7 +1,21 @@
 from flask_sqlalchemy import SQLAlchemy
 import redis
+from controllers.config import Config
 
 db = SQLAlchemy()
 
-# Redis client
-redis_client = redis.StrictRedis(host='localhost', port=6379, db=0, decode_responses=True)
+# Redis client (same server as Celery, see redis.conf); short timeouts so a dead
+# Redis degrades to "no cache" instead of stalling requests
+redis_client = redis.StrictRedis.from_url(
+    Config.REDIS_URL,
+    decode_responses=True,
+    socket_connect_timeout=0.5,
+    socket_timeout=0.5
+)
+
+# Same server, but replies stay bytes: the response cache keeps compressed bodies
+redis_raw_client = redis.StrictRedis.from_url(
+    Config.REDIS_URL,
+    socket_connect_timeout=0.5,
+    socket_timeout=0.5
+)
@@ -0,0 +1,277 @@
+import json
+import logging
+import time
+import uuid
+import redis
+from werkzeug.http import quote_etag
+from flask import current_app, request, Response
+from controllers.database import db, redis_client
+from controllers.models import ParkingLot
+
+log = logging.getLogger(__name__)
+
+LOT_EVENTS_VERSION_KEY = "lots:version"     # last version handed out (global availability version)
+LOT_VERSIONS_KEY = "lots:lot_versions"      # lot id -> version of its last change
+LOT_EPOCH_KEY = "lots:epoch"                # changes if Redis loses the counters, so old ETags never match
+LOT_EVENTS_KEY = "lots:events"              # recent events, scored by version, for resuming clients
+LOT_LAYOUTS_KEY = "lots:layout_versions"    # lot id -> version its set of spots last changed (add/remove/delete)
+LOT_REVISIONS_KEY = "lots:revisions"        # lot id -> parking_lots.revision of its last published state
+LOT_EVENTS_CHANNEL = "lots:availability"    # live fan-out to every open stream
+RECONNECT_MS = 2000                         # EventSource retry hint
+MAX_PUBLISH_ATTEMPTS = 3
+
+# Version, history and publish happen in one script so every subscriber sees
+# events in version order and the history never has holes. A state read at an
+# older lot revision (ARGV[6]) than one already published is refused with 0, so a
+# slow publisher can't overwrite newer counts. Spots whose status flipped
+# (ARGV[7..]) are rescored in the lot's spot ZSET (one member per spot, scored by
+# its last change); a layout change (spots added/removed, lot deleted) is
+# recorded per lot.
+_publish_script = redis_client.register_script("""
+if ARGV[5] == 'deleted' then
+    redis.call('HDEL', KEYS[6], ARGV[4])
+else
+    local published = tonumber(redis.call('HGET', KEYS[6], ARGV[4]) or -1)
+    if tonumber(ARGV[6]) < published then
+        return 0
+    end
+    redis.call('HSET', KEYS[6], ARGV[4], ARGV[6])
+end
+local version = redis.call('INCR', KEYS[1])
+local event = '{"version":' .. version .. ',' .. string.sub(ARGV[1], 2)
+redis.call('HSET', KEYS[3], ARGV[4], version)
+for i = 7, #ARGV do
+    redis.call('ZADD', KEYS[4], version, ARGV[i])
+end
+if ARGV[5] == 'layout' then
+    redis.call('HSET', KEYS[5], ARGV[4], version)
+elseif ARGV[5] == 'deleted' then
+    redis.call('HSET', KEYS[5], ARGV[4], version)
+    redis.call('DEL', KEYS[4])
+end
+redis.call('ZADD', KEYS[2], version, event)
+redis.call('ZREMRANGEBYRANK', KEYS[2], 0, -(tonumber(ARGV[2]) + 1))
+redis.call('PUBLISH', ARGV[3], event)
+return version
+""")
+
+
+# ------------------------ Lot state ------------------------
+def lot_state(lot):
+    return {
+        "lot_id": lot.id,
+        "location_name": lot.location_name,
+        "price": lot.price,
+        "total_spots": lot.number_of_spots,
+        "available_spots": lot.available_spots,
+        "occupied_spots": lot.occupied_spots
+    }
+
+
+def lots_snapshot():
+    return [lot_state(lot) for lot in ParkingLot.query.order_by(ParkingLot.id)]
+
+
+def lot_spots_key(lot_id):
+    return f"lots:{lot_id}:spot_versions"
+
+
+# ------------------------ Publishing ------------------------
+def publish_lot_change(lot_id, spot_id=None, layout=False, spot_ids=None):
+    """Announce a lot's committed availability (absolute counts, so replaying an event
+    twice is harmless). Call after commit with the spot whose status flipped (or
+    spot_ids for several at once), or layout=True when spots were added or removed.
+    Returns the event version, or None when Redis is unavailable - streams then miss
+    it and clients resync on reconnect."""
+    if spot_id is not None:
+        spot_ids = [spot_id]
+    elif spot_ids:
+        spot_ids = list(spot_ids)
+    try:
+        for _ in range(MAX_PUBLISH_ATTEMPTS):
+            # Counts and revision come from one row read; a refusal means a newer
+            # state was published meanwhile, so read again and publish that
+            lot = db.session.get(ParkingLot, lot_id, populate_existing=True)
+            if lot:
+                payload = lot_state(lot)
+                change = "layout" if layout else ""
+                revision = lot.revision
+            else:
+                payload = {"lot_id": lot_id, "deleted": True}
+                change = "deleted"
+                revision = ""
+            if spot_id is not None:
+                payload["spot_id"] = spot_id
+            elif spot_ids:
+                payload["spot_ids"] = spot_ids
+            version = _publish_script(
+                keys=[LOT_EVENTS_VERSION_KEY, LOT_EVENTS_KEY, LOT_VERSIONS_KEY, lot_spots_key(lot_id),
+                      LOT_LAYOUTS_KEY, LOT_REVISIONS_KEY],
+                args=[json.dumps(payload), current_app.config["LOT_EVENTS_KEEP"], LOT_EVENTS_CHANNEL, lot_id,
+                      change, revision, *(spot_ids or [])]
+            )
+            if version:
+                return version
+        log.warning("lot event for lot %s kept losing to newer states; not published", lot_id)
+        return None
+    except redis.RedisError as e:
+        log.warning("lot event publish failed for lot %s: %s", lot_id, e)
+        return None
+
+
+# ------------------------ Versions ------------------------
+# Versions handed to clients are "<epoch>.<version>" tokens. If Redis loses the
+# counter it restarts under a new epoch, so a token from before is refused
+# instead of passing for a recent one once the new counter overtakes it.
+def current_epoch_and_version():
+    """(epoch, version) read together; the epoch is created on first use."""
+    epoch, version = redis_client.mget(LOT_EPOCH_KEY, LOT_EVENTS_VERSION_KEY)
+    if epoch is None:
+        redis_client.set(LOT_EPOCH_KEY, uuid.uuid4().hex, nx=True)
+        epoch = redis_client.get(LOT_EPOCH_KEY)
+    return epoch, int(version or 0)
+
+
+def version_token(epoch, version):
+    return f"{epoch}.{version}"
+
+
+def parse_version_token(token):
+    """(epoch, version) from a version token; raises ValueError when malformed."""
+    epoch, _, version = token.rpartition(".")
+    if not epoch or not version.isdigit():
+        raise ValueError(f"not a version token: {token!r}")
+    return epoch, int(version)
+
+
+def read_version_token():
+    """The current version token, or None when Redis is unavailable."""
+    try:
+        return version_token(*current_epoch_and_version())
+    except redis.RedisError as e:
+        log.warning("availability version read failed: %s", e)
+        return None
+
+
+def spot_changes_since(version):
+    """What changed after `version`, per lot: {lot_id: None} when the lot's spots were
+    added, removed or the lot deleted (resend it whole), else {lot_id: [spot ids]}."""
+    lot_versions = redis_client.hgetall(LOT_VERSIONS_KEY)
+    layouts = redis_client.hgetall(LOT_LAYOUTS_KEY)
+    changed = [int(lot_id) for lot_id, v in lot_versions.items() if int(v) > version]
+
+    pipe = redis_client.pipeline(transaction=False)
+    for lot_id in changed:
+        pipe.zrangebyscore(lot_spots_key(lot_id), f"({version}", "+inf")
+    spot_ids = pipe.execute()
+
+    changes = {}
+    for lot_id, ids in zip(changed, spot_ids):
+        if int(layouts.get(str(lot_id), 0)) > version:
+            changes[lot_id] = None
+        else:
+            changes[lot_id] = [int(spot_id) for spot_id in ids]
+    return changes
+
+
+def availability_etag(representation):
+    """ETag for a response built only from lot/spot availability, or None when
+    Redis is unavailable (serve the full body). Read it before querying, so a change
+    committed meanwhile can only make the ETag older than the body, never newer."""
+    try:
+        epoch, version = current_epoch_and_version()
+    except redis.RedisError as e:
+        log.warning("availability version read failed: %s", e)
+        return None
+    return f"{representation}-{epoch}-{version}"
+
+
+def etag_headers(tag):
+    headers = {"Cache-Control": "private, no-cache"}   # clients revalidate on every poll
+    if tag:
+        headers["ETag"] = quote_etag(tag)
+    return headers
+
+
+def not_modified(tag):
+    """A 304 response when the client's If-None-Match already names `tag`, else None."""
+    if tag is not None and request.if_none_match.contains_weak(tag):
+        return Response(status=304, headers=etag_headers(tag))
+    return None
+
+
+# ------------------------ Resuming ------------------------
+
+def events_since(epoch, version):
+    """Events after `version` of `epoch`, oldest first, or None when that history is
+    gone - trimmed, or lost with a Redis reset - and the client must start over
+    from a snapshot."""
+    current_epoch, latest = current_epoch_and_version()
+    if epoch != current_epoch or version > latest:
+        return None
+    events = [json.loads(raw) for raw in redis_client.zrangebyscore(LOT_EVENTS_KEY, f"({version}", "+inf")]
+    if events[:1] and events[0]["version"] != version + 1:
+        return None
+    if not events and latest > version:
+        return None
+    return events
+
+
+# ------------------------ SSE stream ------------------------
+def sse(event, data, event_id=None):
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event}", f"data: {json.dumps(data)}"]
+    return "\n".join(lines) + "\n\n"
+
+
+def open_lot_stream(since):
+    """Subscribe, then build the opening frames: the missed events after `since` (a
+    version token, as sent in event ids), or a full snapshot when there is no usable
+    version. Subscribing first means nothing published meanwhile is lost; duplicates
+    are dropped by version in the stream. Returns (pubsub, frames, epoch, version).
+    Raises redis.RedisError when Redis is down."""
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    try:
+        pubsub.subscribe(LOT_EVENTS_CHANNEL)
+        events = None
+        if since is not None:
+            since_epoch, since_version = since
+            events = events_since(since_epoch, since_version)
+        if events is None:
+            # Read before the lots, so later changes still arrive
+            epoch, version = current_epoch_and_version()
+            frames = [sse("snapshot", {"version": version, "lots": lots_snapshot()}, version_token(epoch, version))]
+        else:
+            epoch = since_epoch
+            version = events[-1]["version"] if events else since_version
+            frames = [sse("lot", e, version_token(epoch, e["version"])) for e in events]
+    except redis.RedisError:
+        pubsub.close()
+        raise
+    return pubsub, frames, epoch, version
+
+
+def lot_event_stream(pubsub, frames, epoch, version, heartbeat, max_seconds):
+    """Yield SSE frames until `max_seconds`, then end so the client reconnects with
+    Last-Event-ID (keeps workers from being held forever). Event ids are version
+    tokens of `epoch`."""
+    deadline = time.monotonic() + max_seconds
+    try:
+        yield f"retry: {RECONNECT_MS}\n\n"
+        yield from frames
+        last_sent = time.monotonic()
+        while time.monotonic() < deadline:
+            message = pubsub.get_message(timeout=min(heartbeat, max(deadline - time.monotonic(), 0)))
+            if message and message["type"] == "message":
+                event = json.loads(message["data"])
+                if event["version"] > version:
+                    version = event["version"]
+                    last_sent = time.monotonic()
+                    yield sse("lot", event, version_token(epoch, version))
+            elif time.monotonic() - last_sent >= heartbeat:
+                last_sent = time.monotonic()
+                yield ": keepalive\n\n"
+    except redis.RedisError as e:
+        log.warning("lot stream ended: %s", e)
+    finally:
+        pubsub.close()
@@ -0,0 +1,148 @@
+import logging
+import threading
+import time
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+log = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+# ------------------------ Histograms ------------------------
+class Histogram:
+    """Minimal Prometheus histogram: cumulative buckets, sum and count per label set.
+    Values are per process; with several gunicorn workers, scrape each one or
+    aggregate in Prometheus."""
+
+    def __init__(self, name, documentation, labelnames, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}    # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.setdefault(labels, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            pairs = list(zip(self.labelnames, labels))
+            for bound, count in zip(self.buckets, values):
+                lines.append(f"{self.name}_bucket{_labels(pairs + [('le', bound)])} {count}")
+            lines.append(f"{self.name}_bucket{_labels(pairs + [('le', '+Inf')])} {values[-1]}")
+            lines.append(f"{self.name}_sum{_labels(pairs)} {values[-2]}")
+            lines.append(f"{self.name}_count{_labels(pairs)} {values[-1]}")
+        return "\n".join(lines)
+
+
+class Counter:
+    """Minimal Prometheus counter per label set (per process, like Histogram)."""
+
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(list(zip(self.labelnames, labels)))} {value}")
+        return "\n".join(lines)
+
+
+def _labels(pairs):
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency by endpoint.",
+    ("method", "endpoint", "status"), LATENCY_BUCKETS
+)
+REQUEST_QUERIES = Histogram(
+    "db_queries_per_request", "SQL statements issued per request.",
+    ("method", "endpoint"), QUERY_BUCKETS
+)
+REQUEST_DB_TIME = Histogram(
+    "db_time_seconds_per_request", "Time spent executing SQL per request.",
+    ("method", "endpoint"), LATENCY_BUCKETS
+)
+CACHE_REQUESTS = Counter(
+    "response_cache_requests_total", "Response cache lookups by endpoint and result (hit, miss, bypass).",
+    ("endpoint", "result")
+)
+COLLECTORS = (REQUEST_LATENCY, REQUEST_QUERIES, REQUEST_DB_TIME, CACHE_REQUESTS)
+
+
+def render_metrics():
+    return "\n".join(c.render() for c in COLLECTORS) + "\n"
+
+
+# ------------------------ SQLAlchemy hooks ------------------------
+# Listening on the Engine class covers the engine Flask-SQLAlchemy creates lazily;
+# statements outside a request (CLI, Celery) are ignored.
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_started")
+    if has_request_context() and started:
+        g.db_queries = g.get("db_queries", 0) + 1
+        g.db_time = g.get("db_time", 0.0) + time.perf_counter() - started.pop()
+
+
+# ------------------------ Flask hooks ------------------------
+def init_metrics(app):
+    """Record latency, statement count and DB time for every request. Bodies streamed
+    after the view returns (CSV exports) are not included in the numbers."""
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        g.db_queries = 0
+        g.db_time = 0.0
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.get("request_started")
+        if started is None:
+            return response
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        queries, db_time = g.get("db_queries", 0), g.get("db_time", 0.0)
+
+        REQUEST_LATENCY.observe((request.method, endpoint, str(response.status_code)), time.perf_counter() - started)
+        REQUEST_QUERIES.observe((request.method, endpoint), queries)
+        REQUEST_DB_TIME.observe((request.method, endpoint), db_time)
+
+        if app.config["METRICS_DB_HEADERS"]:
+            response.headers["X-DB-Queries"] = str(queries)
+            response.headers["X-DB-Time"] = f"{db_time * 1000:.2f}ms"
+        budget = app.config["QUERY_BUDGET"]
+        if budget and queries > budget:
+            log.warning("%s %s issued %d SQL statements (budget %d)", request.method, endpoint, queries, budget)
+        return response
@@ -7,6 +7,9 @@ import uuid
 '''----------------------------------USER AND ROLE MODELS FOR FLASK SECURITY AUTHENTICATION----------------------------------'''
 class User(db.Model,UserMixin):
     __tablename__='users'
+    __table_args__=(
+        db.UniqueConstraint('name',name='uq_users_name'),
+    )
     id=db.Column(db.Integer,primary_key=True)
     name=db.Column(db.String(100),nullable=False)
     email=db.Column(db.String(200),unique=True,nullable=False)
@@ -28,6 +31,9 @@ class Roles(db.Model,RoleMixin):
 
 class UserRoles(db.Model):
     __tablename__='user_roles'
+    __table_args__=(
+        db.Index('ix_user_roles_user_id','user_id'),        # user.roles lazy loads
+    )
     id=db.Column(db.Integer,primary_key=True)
     user_id=db.Column(db.Integer,db.ForeignKey('users.id'),nullable=False)
     role_id=db.Column(db.Integer,db.ForeignKey('roles.id'),nullable=False)
@@ -43,6 +49,12 @@ class ParkingLot(db.Model):
     pin_code = db.Column(db.String(10), nullable=False)
     number_of_spots = db.Column(db.Integer, nullable=False)
 
+    # Denormalized counters, kept in step with parking_spots by every write path
+    available_spots = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    occupied_spots = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # Bumped with every change to the lot row, so a published state can be told from an older one
+    revision = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
     # Relationship to spots
     spots = db.relationship("ParkingSpot", backref="lot", lazy=True)
 
@@ -50,6 +62,10 @@ class ParkingLot(db.Model):
 
 class ParkingSpot(db.Model):
     __tablename__ = 'parking_spots'
+    __table_args__ = (
+        # Lowest free spot of a lot (claim_spot), per-lot status counts and deletes
+        db.Index('ix_parking_spots_lot_status_id', 'lot_id', 'current_status', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     lot_id = db.Column(db.Integer, db.ForeignKey('parking_lots.id'), nullable=False)
@@ -63,6 +79,12 @@ class ParkingSpot(db.Model):
 
 class Reservation(db.Model):
     __tablename__ = 'reservations'
+    __table_args__ = (
+        db.Index('ix_reservations_user_status', 'user_id', 'current_status'),      # history, release, summaries
+        db.Index('ix_reservations_spot_status', 'spot_id', 'current_status'),      # active booking of a spot
+        db.Index('ix_reservations_status', 'current_status'),                      # active/completed totals
+        db.Index('ix_reservations_parking_time_id', 'parking_time', 'id'),         # booking list keyset order
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
@@ -77,3 +99,42 @@ class Reservation(db.Model):
     current_status = db.Column(db.String(20), default="active")
     # active → parked right now
     # completed → left the parking
+
+
+
+class ArchivedReservation(db.Model):
+    __tablename__ = 'reservations_archive'
+    __table_args__ = (
+        db.Index('ix_reservations_archive_user_time', 'user_id', 'parking_time'),     # history, CSV, summaries
+        db.Index('ix_reservations_archive_parking_time_id', 'parking_time', 'id'),    # booking list keyset order
+        db.Index('ix_reservations_archive_spot', 'spot_id'),                          # spots with booking history
+    )
+
+    # Completed reservations older than ARCHIVE_AFTER_DAYS, moved here in batches by
+    # tasks.archive_reservations so `reservations` only holds recent and active rows.
+    # Same columns and ids; reads go through controllers/reservations.py
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    spot_id = db.Column(db.Integer, db.ForeignKey('parking_spots.id'), nullable=False)
+
+    parking_time = db.Column(db.DateTime)
+    exit_time = db.Column(db.DateTime)
+
+    parking_cost = db.Column(db.Float, default=0.0)
+
+    current_status = db.Column(db.String(20), default="completed")
+
+
+
+class RevenueRollup(db.Model):
+    __tablename__ = 'revenue_rollups'
+
+    # One row per lot per day (UTC exit date); User_ReleaseSpot adds to it in the
+    # same transaction that completes the reservation. No foreign key: a deleted
+    # lot's revenue moves to lot_id 0 (revenue.DELETED_LOTS) and stays in the totals
+    lot_id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+    bookings = db.Column(db.Integer, nullable=False, default=0)
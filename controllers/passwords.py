@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore, Lock
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+
+# ------------------------ Hashing pool ------------------------
+# Password hashing is deliberately CPU-heavy. hashlib's scrypt/pbkdf2 release the GIL,
+# so a few pool threads hash in parallel while the worker's other request threads keep
+# running; the semaphore caps how many logins may queue up before we answer 503
+# instead of letting a burst of logins starve every other endpoint.
+class HashingBusy(Exception):
+    """The hashing pool is saturated; the caller should answer 503."""
+
+
+_pool = None
+_slots = None
+_pool_lock = Lock()
+
+
+def _get_pool():
+    global _pool, _slots
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                config = current_app.config
+                _slots = BoundedSemaphore(config["PASSWORD_HASH_QUEUE"])
+                _pool = ThreadPoolExecutor(
+                    max_workers=config["PASSWORD_HASH_WORKERS"],
+                    thread_name_prefix="password-hash"
+                )
+    return _pool, _slots
+
+
+def _run_in_pool(fn, *args, **kwargs):
+    pool, slots = _get_pool()
+    if not slots.acquire(timeout=current_app.config["PASSWORD_HASH_WAIT"]):
+        raise HashingBusy()
+    try:
+        return pool.submit(fn, *args, **kwargs).result()
+    finally:
+        slots.release()
+
+
+# ------------------------ Policy ------------------------
+def hash_password(password):
+    return _run_in_pool(generate_password_hash, password, method=current_app.config["PASSWORD_HASH_METHOD"])
+
+
+def verify_password(stored_hash, password):
+    return _run_in_pool(check_password_hash, stored_hash, password)
+
+
+def canonical_method(method):
+    """The method prefix werkzeug writes into hashes made with `method`: short forms
+    are expanded the way generate_password_hash does ("pbkdf2" -> "pbkdf2:sha256:
+    <iterations>"), without paying for a hash."""
+    name, *args = method.split(":")
+    if name == "scrypt":
+        n, r, p = map(int, args) if args else (2**15, 8, 1)
+        return f"scrypt:{n}:{r}:{p}"
+    if name == "pbkdf2":
+        hash_name = args[0] if args else "sha256"
+        iterations = int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f"pbkdf2:{hash_name}:{iterations}"
+    raise ValueError(f"Invalid hash method '{method}'.")
+
+
+def needs_rehash(stored_hash):
+    """True when stored_hash was made with a different algorithm/cost than the policy."""
+    return stored_hash.split("$", 1)[0] != canonical_method(current_app.config["PASSWORD_HASH_METHOD"])
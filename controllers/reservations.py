@@ -0,0 +1,197 @@
+import base64
+from datetime import datetime
+from sqlalchemy import select, update, union_all, or_, and_, func, case, cast, literal, Numeric
+from controllers.database import db
+from controllers.models import User, ParkingLot, ParkingSpot, Reservation, ArchivedReservation
+
+
+# ------------------------ Joined booking rows ------------------------
+# Bookings live in two tables with the same columns and disjoint ids: `reservations`
+# (active and recent) and `reservations_archive` (completed, moved by
+# tasks.archive_reservations). Listings read both as one UNION ALL whose arms carry
+# every filter themselves, so each arm uses its own table's indexes.
+RESERVATION_TABLES = (Reservation, ArchivedReservation)
+
+
+def _booking_arm(source, lot_id=None, status=None, date_from=None, date_to=None, user_email=None,
+                 user_id=None, cursor=None):
+    query = (
+        select(
+            source.id.label("reservation_id"),
+            source.user_id,
+            User.name.label("user_name"),
+            User.email.label("user_email"),
+            ParkingLot.id.label("lot_id"),
+            ParkingLot.location_name.label("lot_name"),
+            ParkingSpot.id.label("spot_id"),
+            source.parking_time,
+            source.exit_time,
+            source.current_status.label("status"),
+            source.parking_cost,
+        )
+        .select_from(source)
+        .outerjoin(User, User.id == source.user_id)
+        .outerjoin(ParkingSpot, ParkingSpot.id == source.spot_id)
+        .outerjoin(ParkingLot, ParkingLot.id == ParkingSpot.lot_id)
+    )
+    if lot_id is not None:
+        query = query.where(ParkingSpot.lot_id == lot_id)
+    if status:
+        query = query.where(source.current_status == status)
+    if date_from:
+        query = query.where(source.parking_time >= date_from)
+    if date_to:
+        query = query.where(source.parking_time < date_to)
+    if user_email:
+        query = query.where(User.email == user_email)
+    if user_id is not None:
+        query = query.where(source.user_id == user_id)
+    if cursor:
+        # Rows strictly after the cursor in (parking_time DESC, id DESC) order
+        parking_time, reservation_id = cursor
+        query = query.where(or_(
+            source.parking_time < parking_time,
+            and_(source.parking_time == parking_time, source.id < reservation_id),
+        ))
+    return query
+
+
+def booking_rows(lot_id=None, status=None, date_from=None, date_to=None, user_email=None, user_id=None,
+                 cursor=None):
+    """One SELECT over hot and archived reservations joined to spot, lot and user - the
+    row shape every booking listing/export needs, without per-row lookups. Optional
+    filters (date_to is exclusive) and a keyset `cursor` from encode_cursor() apply to
+    both tables; order the result with newest_first() or by_id(). Raises ValueError
+    for a malformed cursor."""
+    filters = dict(lot_id=lot_id, status=status, date_from=date_from, date_to=date_to,
+                   user_email=user_email, user_id=user_id, cursor=decode_cursor(cursor) if cursor else None)
+    # The archive only holds completed bookings
+    sources = [Reservation] if status and status != "completed" else RESERVATION_TABLES
+    return union_all(*(_booking_arm(source, **filters) for source in sources))
+
+
+def newest_first(query):
+    columns = query.selected_columns
+    return query.order_by(columns.parking_time.desc(), columns.reservation_id.desc())
+
+
+def by_id(query):
+    return query.order_by(query.selected_columns.reservation_id)
+
+
+def hours_between(start, end):
+    """SQL expression for the hours between two timestamp columns."""
+    if db.session.get_bind().dialect.name == "postgresql":
+        return func.extract("epoch", end - start) / 3600.0
+    return (func.julianday(end) - func.julianday(start)) * 24.0
+
+
+# ------------------------ Bulk release ------------------------
+def complete_reservations(reservation_ids, exit_time):
+    """Complete these active reservations with one UPDATE, pricing each in SQL as
+    round(hours parked * lot price, 2) like a single release. Runs inside the caller's
+    transaction; returns {reservation_id: parking_cost} for the reservations actually
+    completed - fewer if some were released concurrently."""
+    lot_price = (
+        select(ParkingLot.price)
+        .join(ParkingSpot, ParkingSpot.lot_id == ParkingLot.id)
+        .where(ParkingSpot.id == Reservation.spot_id)
+        .scalar_subquery()
+    )
+    hours = hours_between(Reservation.parking_time, literal(exit_time, db.DateTime))
+    completed = db.session.execute(
+        update(Reservation)
+        .where(Reservation.id.in_(reservation_ids), Reservation.current_status == "active")
+        .values(
+            exit_time=exit_time,
+            current_status="completed",
+            parking_cost=func.round(cast(hours * lot_price, Numeric), 2)
+        )
+        .returning(Reservation.id, Reservation.parking_cost)
+        .execution_options(synchronize_session=False)
+    )
+    return dict(completed.all())
+
+
+# ------------------------ Per-user summary ------------------------
+def user_reservations(user_id):
+    """A user's hot and archived reservations as one subquery (each arm filtered by user)."""
+    return union_all(*(
+        select(source.id, source.spot_id, source.parking_time, source.exit_time, source.parking_cost)
+        .where(source.user_id == user_id)
+        for source in RESERVATION_TABLES
+    )).subquery("user_reservations")
+
+
+def user_summary(user_id):
+    """Booking count plus hours/cost/per-lot usage of completed bookings, as two
+    grouped queries instead of a row (and two lookups) per reservation."""
+    reservations = user_reservations(user_id)
+    completed = reservations.c.exit_time.isnot(None)
+    totals = db.session.execute(
+        select(
+            func.count(reservations.c.id),
+            func.sum(case((completed, hours_between(reservations.c.parking_time, reservations.c.exit_time)), else_=0)),
+            func.sum(case((completed, reservations.c.parking_cost), else_=0))
+        )
+    ).one()
+    lot_usage = db.session.execute(
+        select(ParkingLot.location_name, func.count(reservations.c.id))
+        .join(ParkingSpot, ParkingSpot.id == reservations.c.spot_id)
+        .join(ParkingLot, ParkingLot.id == ParkingSpot.lot_id)
+        .where(completed)
+        .group_by(ParkingLot.location_name)
+    ).all()
+
+    total_parks, total_hours, total_cost = totals
+    return {
+        "total_parks": total_parks,
+        "total_hours": round(float(total_hours or 0), 2),
+        "total_cost": round(float(total_cost or 0), 2),
+        "lot_usage": {name: count for name, count in lot_usage}
+    }
+
+
+def user_summary_cache_key(user_id):
+    return f"user:{user_id}:summary"
+
+
+# ------------------------ Keyset pagination ------------------------
+def encode_cursor(parking_time, reservation_id):
+    raw = f"{parking_time.isoformat()}|{reservation_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError on anything malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        parking_time, reservation_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return datetime.fromisoformat(parking_time), int(reservation_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+# ------------------------ Request argument parsing ------------------------
+def parse_date_arg(value, name):
+    """Parse an ISO date/datetime query argument; raises ValueError naming the argument."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO date, e.g. 2024-01-31")
+
+
+def booking_row_to_dict(row):
+    return {
+        "reservation_id": row.reservation_id,
+        "user_name": row.user_name,
+        "user_email": row.user_email,
+        "lot_name": row.lot_name,
+        "spot_id": row.spot_id,
+        "parking_time": row.parking_time,
+        "exit_time": row.exit_time,
+        "status": row.status,
+        "parking_cost": row.parking_cost or 0
+    }
@@ -0,0 +1,103 @@
+from sqlalchemy import select, union_all, func, literal
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from controllers.database import db
+from controllers.models import ParkingSpot, Reservation, ArchivedReservation, RevenueRollup
+
+GRANULARITIES = ("day", "week", "month")
+DELETED_LOTS = 0      # rollup lot_id holding the revenue of lots that no longer exist
+
+
+# ------------------------ Rollup writes ------------------------
+def record_revenue(lot_id, day, amount, bookings=1):
+    """Add a completed booking to the (lot, day) bucket with an upsert, inside the
+    caller's transaction. Concurrent releases on the same bucket never lose an update."""
+    dialect = db.session.get_bind().dialect.name
+    insert = pg_insert if dialect == "postgresql" else sqlite_insert
+    stmt = insert(RevenueRollup).values(lot_id=lot_id, day=day, revenue=amount, bookings=bookings)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[RevenueRollup.lot_id, RevenueRollup.day],
+        set_={
+            "revenue": RevenueRollup.revenue + stmt.excluded.revenue,
+            "bookings": RevenueRollup.bookings + stmt.excluded.bookings,
+        }
+    ))
+
+
+def retire_lot_revenue(lot_id):
+    """Fold a lot's buckets into the DELETED_LOTS bucket before the lot is deleted, so
+    lifetime totals keep its revenue (its spots go too, so a rebuild can't recover it)."""
+    dialect = db.session.get_bind().dialect.name
+    insert = pg_insert if dialect == "postgresql" else sqlite_insert
+    stmt = insert(RevenueRollup).from_select(
+        ["lot_id", "day", "revenue", "bookings"],
+        select(literal(DELETED_LOTS), RevenueRollup.day, RevenueRollup.revenue, RevenueRollup.bookings)
+        .where(RevenueRollup.lot_id == lot_id)
+    )
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[RevenueRollup.lot_id, RevenueRollup.day],
+        set_={
+            "revenue": RevenueRollup.revenue + stmt.excluded.revenue,
+            "bookings": RevenueRollup.bookings + stmt.excluded.bookings,
+        }
+    ))
+    db.session.execute(RevenueRollup.__table__.delete().where(RevenueRollup.lot_id == lot_id))
+
+
+def rebuild_revenue_rollups():
+    """Recompute every bucket from completed reservations, hot and archived (backfill/repair).
+    The DELETED_LOTS bucket is kept as is. Returns the number of buckets written."""
+    if db.session.get_bind().dialect.name == "postgresql":
+        # Hold off concurrent record_revenue() upserts until the rebuilt rows are committed
+        db.session.execute(db.text("LOCK TABLE revenue_rollups IN EXCLUSIVE MODE"))
+    db.session.execute(RevenueRollup.__table__.delete().where(RevenueRollup.lot_id != DELETED_LOTS))
+    completed = union_all(*(
+        select(source.id, source.spot_id, source.exit_time, source.parking_cost)
+        .where(source.current_status == "completed", source.exit_time.isnot(None))
+        for source in (Reservation, ArchivedReservation)
+    )).subquery("completed")
+    day = func.date(completed.c.exit_time)
+    totals = (
+        select(
+            ParkingSpot.lot_id,
+            day,
+            func.coalesce(func.sum(completed.c.parking_cost), literal(0.0)),
+            func.count(completed.c.id)
+        )
+        .join(ParkingSpot, ParkingSpot.id == completed.c.spot_id)
+        .group_by(ParkingSpot.lot_id, day)
+    )
+    written = db.session.execute(
+        RevenueRollup.__table__.insert().from_select(["lot_id", "day", "revenue", "bookings"], totals)
+    ).rowcount
+    db.session.commit()
+    return written
+
+
+# ------------------------ Rollup reads ------------------------
+def bucket_start(granularity):
+    """SQL expression mapping RevenueRollup.day to the first day of its bucket."""
+    if granularity == "day":
+        return RevenueRollup.day
+    if db.session.get_bind().dialect.name == "postgresql":
+        return func.date(func.date_trunc(granularity, RevenueRollup.day))
+    if granularity == "week":
+        # SQLite: forward to Sunday, back six days -> the Monday starting the ISO week
+        return func.date(RevenueRollup.day, "weekday 0", "-6 days")
+    return func.strftime("%Y-%m-01", RevenueRollup.day)
+
+
+def revenue_totals(date_from=None, date_to=None, granularity=None):
+    """Rows of (lot_id, bucket, revenue) from the rollup table; bucket is None
+    without a granularity. date_from/date_to are inclusive days."""
+    bucket = bucket_start(granularity) if granularity else literal(None)
+    query = (
+        select(RevenueRollup.lot_id, bucket.label("bucket"), func.sum(RevenueRollup.revenue).label("revenue"))
+        .group_by(RevenueRollup.lot_id, bucket)
+        .order_by(RevenueRollup.lot_id, bucket)
+    )
+    if date_from:
+        query = query.where(RevenueRollup.day >= date_from)
+    if date_to:
+        query = query.where(RevenueRollup.day <= date_to)
+    return db.session.execute(query).all()
@@ -1,8 +1,24 @@
 from flask_restful import Resource
-from flask import request, jsonify
+from flask import request, jsonify, current_app
 from controllers.database import db
 from controllers.models import User, ParkingLot, ParkingSpot, Reservation
 from controllers.auth_decorators import admin_required
+from controllers.availability import adjust_lot_counters, add_spots, remove_free_spots
+from controllers.csv_export import iter_csv, csv_response
+from controllers.cache import cached_response, invalidate_tags
+from controllers.revenue import GRANULARITIES, revenue_totals, retire_lot_revenue
+from controllers.dashboard import dashboard_summary, dashboard_snapshot
+from controllers.lot_events import (
+    publish_lot_change, availability_etag, not_modified, etag_headers,
+    lot_state, read_version_token, current_epoch_and_version, parse_version_token, version_token,
+    spot_changes_since
+)
+from controllers.spot_map import SPOT_FORMATS, spots_by_lot, spot_statuses, encode_spot_map, spot_list
+import redis
+from controllers.reservations import (
+    booking_rows, newest_first, by_id,
+    encode_cursor, parse_date_arg, booking_row_to_dict
+)
 from datetime import datetime
 
 #------------------- Create Parking Lot -------------------
@@ -15,20 +31,29 @@ class ParkingLOTCreator(Resource):
             if field not in data:
                 return {"message": f"{field} is required"}, 400
 
+        number_of_spots = data["number_of_spots"]
+        if not isinstance(number_of_spots, int) or number_of_spots < 0:
+            return {"message": "number_of_spots must be a non-negative integer"}, 400
+
         lot = ParkingLot(
             location_name=data["location_name"],
             price=data["price"],
             pin_code=data["pin_code"],
-            number_of_spots=data["number_of_spots"]
+            number_of_spots=number_of_spots,
+            available_spots=number_of_spots,
+            occupied_spots=0
         )
-        db.session.add(lot)
-        db.session.commit()
-
-        # Automatically create spots
-        for _ in range(lot.number_of_spots):
-            spot = ParkingSpot(lot_id=lot.id, current_status="A")
-            db.session.add(spot)
-        db.session.commit()
+        # Lot and spots commit together or not at all
+        try:
+            db.session.add(lot)
+            db.session.flush()   # assigns lot.id without committing
+            add_spots(lot.id, number_of_spots)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            return {"message": "Error creating lot", "error": str(e)}, 500
+        publish_lot_change(lot.id, layout=True)
+        invalidate_tags("lots", "users")
 
         return {
             "message": "Parking lot created successfully",
@@ -40,30 +65,79 @@ class ParkingLOTCreator(Resource):
 #------------------- View All Lots -------------------
 class ParkingLOTViewer(Resource):
     @admin_required
+    @cached_response("admin-lots", "LOTS_CACHE_TTL", tags=("lots",))
     def get(self):
-        lots = ParkingLot.query.all()
+        # format=compact: spot statuses as id ranges + a bitmap instead of one object per spot
+        spot_format = request.args.get("format", "full")
+        if spot_format not in SPOT_FORMATS:
+            return {"message": f"format must be one of {', '.join(SPOT_FORMATS)}"}, 400
+        encode = encode_spot_map if spot_format == "compact" else spot_list
+
+        since = request.args.get("since")
+        if since is not None:
+            try:
+                since_epoch, since_version = parse_version_token(since)
+            except ValueError:
+                return {"message": "since must be the version of an earlier response"}, 400
+            return self.changes_since(since, since_epoch, since_version, encode)
+
+        etag = availability_etag(f"admin-lots-{spot_format}")
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        version = read_version_token()   # before the queries: later changes show up in the next ?since=
+
+        lots = ParkingLot.query.order_by(ParkingLot.id).all()
+        spots = spots_by_lot()   # one query for every spot instead of a lazy load per lot
         lot_list = []
         for lot in lots:
-            total_spots = len(lot.spots)
-            available = sum(1 for s in lot.spots if s.current_status == "A")
-            occupied = total_spots - available
-            lot_list.append({
-                "lot_id": lot.id,
-                "location_name": lot.location_name,
-                "price": lot.price,
-                "total_spots": total_spots,
-                "available_spots": available,
-                "occupied_spots": occupied,
-                "spots": [{"spot_id": s.id, "status": "Available" if s.current_status=="A" else "Occupied"} for s in lot.spots]
-            })
-        return {"parking_lots": lot_list}, 200
+            lot_list.append(dict(lot_state(lot), spots=encode(spots.get(lot.id, []))))
+        return {"version": version, "parking_lots": lot_list}, 200, etag_headers(etag)
+
+    @staticmethod
+    def changes_since(since, since_epoch, since_version, encode):
+        """Only what changed after `since`: flipped spots per lot, whole lots whose
+        spots were added/removed, and deleted lot ids. A token from another epoch
+        (Redis lost its history since) is refused."""
+        try:
+            epoch, version = current_epoch_and_version()
+            if since_epoch == epoch and since_version <= version:
+                changes = spot_changes_since(since_version)
+            else:
+                changes = None
+        except redis.RedisError:
+            return {"message": "Change tracking unavailable, fetch without since"}, 503
+        if changes is None:
+            return {"message": "Unknown version, fetch without since"}, 409
+
+        lots = {lot.id: lot for lot in ParkingLot.query.filter(ParkingLot.id.in_(list(changes)))}
+        resend = [lot_id for lot_id, spot_ids in changes.items() if spot_ids is None and lot_id in lots]
+        full_spots = spots_by_lot(resend) if resend else {}
+        statuses = spot_statuses([spot_id for ids in changes.values() if ids for spot_id in ids])
+
+        lot_list = []
+        for lot_id in sorted(lots):
+            entry = lot_state(lots[lot_id])
+            if changes[lot_id] is None:
+                entry["spots"] = encode(full_spots.get(lot_id, []))
+            else:
+                flipped = [(spot_id, statuses[spot_id]) for spot_id in changes[lot_id] if spot_id in statuses]
+                entry["changed_spots"] = spot_list(sorted(flipped))
+            lot_list.append(entry)
+        return {
+            "version": version_token(epoch, version),
+            "since": since,
+            "parking_lots": lot_list,
+            "deleted_lots": sorted(lot_id for lot_id in changes if lot_id not in lots)
+        }, 200
 
 
 #------------------- Edit Lot -------------------
 class ParkingLOTEditor(Resource):
     @admin_required
     def put(self, lot_id):
-        lot = ParkingLot.query.get(lot_id)
+        # Row lock (PostgreSQL) so two edits can't both resize from the same old count
+        lot = db.session.get(ParkingLot, lot_id, with_for_update=True)
         if not lot:
             return {"message": "Parking lot not found"}, 404
 
@@ -75,21 +149,27 @@ class ParkingLOTEditor(Resource):
         if "pin_code" in data:
             lot.pin_code = data["pin_code"]
 
+        layout_changed = False
         if "number_of_spots" in data:
             new_count = data["number_of_spots"]
+            if not isinstance(new_count, int) or new_count < 0:
+                db.session.rollback()
+                return {"message": "number_of_spots must be a non-negative integer"}, 400
             old_count = lot.number_of_spots
             if new_count > old_count:
-                for _ in range(new_count - old_count):
-                    db.session.add(ParkingSpot(lot_id=lot.id, current_status="A"))
+                add_spots(lot.id, new_count - old_count)
             elif new_count < old_count:
-                available_spots = ParkingSpot.query.filter_by(lot_id=lot.id, current_status="A").all()
-                if len(available_spots) < (old_count - new_count):
-                    return {"message": "Cannot reduce spots; some are occupied"}, 400
-                for spot in available_spots[:old_count - new_count]:
-                    db.session.delete(spot)
+                if remove_free_spots(lot.id, old_count - new_count) < old_count - new_count:
+                    db.session.rollback()
+                    return {"message": "Cannot reduce spots; some are occupied or have booking history"}, 400
+            adjust_lot_counters(lot.id, available_delta=new_count - old_count)
             lot.number_of_spots = new_count
+            layout_changed = new_count != old_count
 
+        lot.revision = ParkingLot.revision + 1
         db.session.commit()
+        publish_lot_change(lot.id, layout=layout_changed)
+        invalidate_tags("lots", "users")
         return {"message": "Parking lot updated successfully", "lot_id": lot.id}, 200
 
 
@@ -107,9 +187,12 @@ class ParkingLOTDeleter(Resource):
             return {"message": "Cannot delete lot, some spots are occupied"}, 400
 
         try:
+            retire_lot_revenue(lot.id)
             ParkingSpot.query.filter_by(lot_id=lot.id).delete()
             db.session.delete(lot)
             db.session.commit()
+            publish_lot_change(lot_id)
+            invalidate_tags("lots", "users")
             return {"message": "Parking lot deleted successfully"}, 200
         except Exception as e:
             db.session.rollback()
@@ -119,6 +202,7 @@ class ParkingLOTDeleter(Resource):
 #------------------- View All Users -------------------
 class UserViewer(Resource):
     @admin_required
+    @cached_response("admin-users", "USERS_CACHE_TTL", tags=("users", "lots"))
     def get(self):
         users = User.query.all()
         result = []
@@ -135,7 +219,7 @@ class UserViewer(Resource):
                     "current_status": "Parked",
                     "current_lot": lot.location_name if lot else None,
                     "current_spot": spot.id if spot else None,
-                    "parking_since": active_res.parking_time.isoformat() if active_res.parking_time else None
+                    "parking_since": active_res.parking_time
                 }
             else:
                 user_info = {
@@ -156,79 +240,121 @@ class UserViewer(Resource):
 class AdminDashSummary(Resource):
     @admin_required
     def get(self):
-        lots = ParkingLot.query.all()
-        total_lots = len(lots)
-        total_spots = sum(l.number_of_spots for l in lots)
-        occupied_spots = sum(1 for l in lots for s in l.spots if s.current_status == "O")
-        available_spots = total_spots - occupied_spots
-
-        # Active users (currently parked)
-        active_users = Reservation.query.filter_by(current_status="active").count()
-
-        # Total users
-        total_users = User.query.count()
+        return dashboard_summary(), 200
 
-        # Total revenue calculation
-        completed_res = Reservation.query.filter_by(current_status="completed").all()
-        total_revenue = sum(r.parking_cost for r in completed_res if r.parking_cost)
 
-        summary = {
-            "total_lots": total_lots,
-            "total_spots": total_spots,
-            "occupied_spots": occupied_spots,
-            "available_spots": available_spots,
-            "active_users": active_users,
-            "total_users": total_users,
-            "total_revenue": round(total_revenue, 2)
-        }
-
-        return summary, 200
+#------------------- Admin Dashboard Snapshot -------------------
+class AdminDashboard(Resource):
+    @admin_required
+    def get(self):
+        return dashboard_snapshot(ttl=current_app.config["DASHBOARD_CACHE_TTL"]), 200
 
 
 #------------------- All Parking Records -------------------
 class Admin_AllBookings(Resource):
+    DEFAULT_LIMIT = 50
+    MAX_LIMIT = 500
+
     @admin_required
     def get(self):
-        reservations = Reservation.query.order_by(Reservation.parking_time.desc()).all()
-        all_records = []
-        for res in reservations:
-            user = User.query.get(res.user_id)
-            spot = ParkingSpot.query.get(res.spot_id)
-            lot = ParkingLot.query.get(spot.lot_id) if spot else None
-            all_records.append({
-                "reservation_id": res.id,
-                "user_name": user.name if user else None,
-                "user_email": user.email if user else None,
-                "lot_name": lot.location_name if lot else None,
-                "spot_id": spot.id if spot else None,
-                "parking_time": res.parking_time.isoformat() if res.parking_time else None,
-                "exit_time": res.exit_time.isoformat() if res.exit_time else None,
-                "status": res.current_status,
-                "parking_cost": res.parking_cost or 0
-            })
-        return {"all_reservations": all_records}, 200
+        args = request.args
+        limit = min(args.get("limit", self.DEFAULT_LIMIT, type=int), self.MAX_LIMIT)
+        lot_id = args.get("lot_id", type=int)
+        try:
+            date_from = parse_date_arg(args.get("from"), "from")
+            date_to = parse_date_arg(args.get("to"), "to")
+            query = booking_rows(
+                lot_id=lot_id,
+                status=args.get("status"),
+                date_from=date_from,
+                date_to=date_to,
+                user_email=args.get("user_email"),
+                cursor=args.get("cursor")
+            )
+        except ValueError as e:
+            return {"message": str(e)}, 400
+        if limit < 1:
+            return {"message": "limit must be positive"}, 400
+
+        # Fetch one extra row to know whether another page exists
+        rows = db.session.execute(newest_first(query).limit(limit + 1)).all()
+        page = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit:
+            last = page[-1]
+            next_cursor = encode_cursor(last.parking_time, last.reservation_id)
+
+        return {
+            "all_reservations": [booking_row_to_dict(row) for row in page],
+            "next_cursor": next_cursor
+        }, 200
     
+#------------------- All Bookings CSV Export -------------------
+class Admin_CSVExport(Resource):
+    @admin_required
+    def get(self):
+        try:
+            date_from = parse_date_arg(request.args.get("from"), "from")
+            date_to = parse_date_arg(request.args.get("to"), "to")
+        except ValueError as e:
+            return {"message": str(e)}, 400
+        query = by_id(booking_rows(date_from=date_from, date_to=date_to))
+
+        def to_values(row):
+            return [
+                row.reservation_id,
+                row.user_name or "",
+                row.user_email or "",
+                row.lot_name or "",
+                row.spot_id or "",
+                row.parking_time.isoformat() if row.parking_time else "",
+                row.exit_time.isoformat() if row.exit_time else "",
+                row.status,
+                row.parking_cost or 0
+            ]
+
+        header = ["Reservation ID", "User Name", "User Email", "Lot Name", "Spot ID",
+                  "Parking Time", "Exit Time", "Status", "Cost"]
+        return csv_response("all_reservations.csv", iter_csv(header, query, to_values))
+
+
     #-----------------------revenue
 class AdminRevenue(Resource):
     @admin_required
     def get(self):
-        lots = ParkingLot.query.all()
-        revenue_data = []
+        granularity = request.args.get("granularity")
+        if granularity and granularity not in GRANULARITIES:
+            return {"message": f"granularity must be one of {', '.join(GRANULARITIES)}"}, 400
+        try:
+            # Whole days, both ends inclusive
+            date_from = parse_date_arg(request.args.get("from"), "from")
+            date_to = parse_date_arg(request.args.get("to"), "to")
+        except ValueError as e:
+            return {"message": str(e)}, 400
 
-        for lot in lots:
-            # Sum revenue of all completed reservations for this lot
-            total_revenue = (
-                db.session.query(db.func.sum(Reservation.parking_cost))
-                .join(ParkingSpot, ParkingSpot.id == Reservation.spot_id)
-                .filter(ParkingSpot.lot_id == lot.id)
-                .filter(Reservation.current_status == "completed")
-                .scalar()
-            ) or 0
-
-            revenue_data.append({
-                "lot_name": lot.location_name,
-                "revenue": round(total_revenue, 2)
-            })
+        rows = revenue_totals(
+            date_from=date_from.date() if date_from else None,
+            date_to=date_to.date() if date_to else None,
+            granularity=granularity
+        )
+        revenue_by_lot = {}
+        buckets_by_lot = {}
+        for lot_id, bucket, revenue in rows:
+            revenue_by_lot[lot_id] = revenue_by_lot.get(lot_id, 0) + (revenue or 0)
+            if granularity:
+                buckets_by_lot.setdefault(lot_id, []).append({
+                    "period": str(bucket)[:10],
+                    "revenue": round(revenue or 0, 2)
+                })
 
-        return {"revenue_by_lot": revenue_data}, 200
+        revenue_data = []
+        for lot_id, location_name in db.session.query(ParkingLot.id, ParkingLot.location_name).order_by(ParkingLot.id):
+            entry = {
+                "lot_name": location_name,
+                "revenue": round(revenue_by_lot.get(lot_id, 0), 2)
+            }
+            if granularity:
+                entry["buckets"] = buckets_by_lot.get(lot_id, [])
+            revenue_data.append(entry)
 
+        return {"revenue_by_lot": revenue_data}, 200
@@ -1,34 +1,14 @@
 from flask_restful import Resource
 from flask import request, jsonify
-from controllers.models import User, Roles
+from controllers.models import User, Roles, UserRoles
 from controllers.database import db
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from functools import wraps
+from controllers.passwords import hash_password, verify_password, needs_rehash, HashingBusy
+from controllers.cache import invalidate_tags
+from flask_jwt_extended import create_access_token, jwt_required
+from sqlalchemy.exc import IntegrityError
 from datetime import timedelta
 
-# ------------------------ Role-based decorators ------------------------
-def admin_required(fn):
-    @wraps(fn)
-    @jwt_required()
-    def wrapper(*args, **kwargs):
-        current_user_email = get_jwt_identity()
-        user = User.query.filter_by(email=current_user_email).first()
-        if not user or "admin" not in [r.name for r in user.roles]:
-            return {"message": "Admin access required"}, 403
-        return fn(*args, **kwargs)
-    return wrapper
-
-def user_required(fn):
-    @wraps(fn)
-    @jwt_required()
-    def wrapper(*args, **kwargs):
-        current_user_email = get_jwt_identity()
-        user = User.query.filter_by(email=current_user_email).first()
-        if not user or "user" not in [r.name for r in user.roles]:
-            return {"message": "User access required"}, 403
-        return fn(*args, **kwargs)
-    return wrapper
+BUSY_RESPONSE = {"message": "Server is busy, please try again"}, 503, {"Retry-After": "1"}
 
 # ------------------------ Login API ------------------------
 class LoginAPI(Resource):
@@ -45,13 +25,25 @@ class LoginAPI(Resource):
         if not user:
             return {"message": "User does not exist"}, 404
 
-        if not check_password_hash(user.password, password):
-            return {"message": "Invalid password"}, 401
+        try:
+            if not verify_password(user.password, password):
+                return {"message": "Invalid password"}, 401
+
+            # Upgrade hashes made under an older policy while we have the plaintext
+            if needs_rehash(user.password):
+                user.password = hash_password(password)
+                db.session.commit()
+        except HashingBusy:
+            return BUSY_RESPONSE
 
         # Create JWT token (valid for 8 hours)
+        roles = [r.name for r in user.roles]
         access_token = create_access_token(
             identity=user.email,
-            additional_claims={"roles": [r.name for r in user.roles]},
+            additional_claims={
+                "roles": roles,
+                "token_uniquifier": user.fs_token_uniquifier
+            },
             expires_delta=timedelta(hours=8)
         )
 
@@ -61,48 +53,73 @@ class LoginAPI(Resource):
             "user": {
                 "name": user.name,
                 "email": user.email,
-                "roles": [r.name for r in user.roles],
-                "user_role": [r.name for r in user.roles][0]  # first role
+                "roles": roles,
+                "user_role": roles[0]  # first role
             }
         }, 200
 
 # ------------------------ Register API ------------------------
+_user_role_id = None
+
+
+def user_role_id():
+    """Id of the 'user' role, looked up (or created) once per process."""
+    global _user_role_id
+    if _user_role_id is None:
+        user_role = Roles.query.filter_by(name='user').first()
+        if not user_role:
+            # If role doesn't exist (rare), create it
+            user_role = Roles(name='user', description='Regular user role')
+            db.session.add(user_role)
+            db.session.commit()
+        _user_role_id = user_role.id
+    return _user_role_id
+
+
 class RegisterAPI(Resource):
     def post(self):
         data = request.get_json()
         if not data or 'username' not in data or 'email' not in data or 'password' not in data:
             return {"message": "Username, email, and password required"}, 400
+        if len(data.get('password')) < 6:
+            return {"message": "Password must be at least 6 characters"}, 400
 
-        if User.query.filter_by(name=data.get('username')).first():
+        # One lookup for both conflicts; the unique constraints catch any race after it
+        taken = db.session.query(User.name, User.email).filter(
+            (User.name == data.get('username')) | (User.email == data.get('email'))
+        ).all()
+        if any(name == data.get('username') for name, _ in taken):
             return {"message": "Username already exists"}, 409
-        if User.query.filter_by(email=data.get('email')).first():
+        if taken:
             return {"message": "Email already registered"}, 409
-        if len(data.get('password')) < 6:
-            return {"message": "Password must be at least 6 characters"}, 400
 
-        # Assign user role
-        user_role = Roles.query.filter_by(name='user').first()
-        if not user_role:
-            # If role doesn't exist (rare), create it
-            user_role = Roles(name='user', description='Regular user role')
-            db.session.add(user_role)
-            db.session.commit()
+        try:
+            password_hash = hash_password(data.get('password'))
+        except HashingBusy:
+            return BUSY_RESPONSE
 
+        role_id = user_role_id()
         new_user = User(
             name=data.get('username'),
             email=data.get('email'),
-            password=generate_password_hash(data.get('password')),
-            roles=[user_role]
+            password=password_hash
         )
-        db.session.add(new_user)
-        db.session.commit()
+        try:
+            db.session.add(new_user)
+            db.session.flush()
+            db.session.add(UserRoles(user_id=new_user.id, role_id=role_id))
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return {"message": "Username or email already registered"}, 409
+        invalidate_tags("users")
 
         return {
             "message": "User registered successfully",
             "user": {
                 "name": new_user.name,
                 "email": new_user.email,
-                "user_role": [r.name for r in new_user.roles][0]
+                "user_role": "user"
             }
         }, 201
 
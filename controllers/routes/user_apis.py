@@ -1,12 +1,23 @@
 from flask_restful import Resource
-from flask import request, jsonify, make_response, send_file
+from flask import request, jsonify, g, current_app, Response, stream_with_context
 from controllers.database import db
-from controllers.models import User, ParkingLot, ParkingSpot, Reservation
-from datetime import datetime
-from controllers.auth_decorators import user_required
-from flask_jwt_extended import jwt_required, get_jwt_identity
-import csv
-from io import StringIO
+from controllers.models import ParkingLot, ParkingSpot, Reservation
+from sqlalchemy import select, update, insert
+from datetime import datetime, timedelta
+from flask_jwt_extended import create_access_token
+from controllers.auth_decorators import user_required, stream_user_required, STREAM_TOKEN_SCOPE
+from controllers.availability import adjust_lot_counters, claim_spot, claim_spots, SpotAllocationConflict
+from controllers.reservations import (
+    booking_rows, newest_first, by_id, user_summary, user_summary_cache_key, complete_reservations
+)
+from controllers.cache import cache_get, cache_set, cache_delete, cached_response, invalidate_tags
+from controllers.revenue import record_revenue
+from controllers.csv_export import iter_csv, csv_response
+from controllers.lot_events import (
+    publish_lot_change, open_lot_stream, lot_event_stream, availability_etag, not_modified, etag_headers,
+    parse_version_token
+)
+import redis
 
 
 #from controllers.tasks import celery_app  # Uncomment if Celery setup is ready
@@ -15,122 +26,286 @@ from io import StringIO
 #------------------- View Available Lots -------------------
 class User_ViewLots(Resource):
     @user_required
+    @cached_response("user-lots", "LOTS_CACHE_TTL", tags=("lots",))
     def get(self):
-        lots = ParkingLot.query.all()
+        # Unchanged since the client's copy: answer from Redis without touching the lot table
+        etag = availability_etag("user-lots")
+        cached = not_modified(etag)
+        if cached:
+            return cached
+
+        lots = ParkingLot.query.order_by(ParkingLot.id).all()
         final_list = []
         for lot in lots:
-            available_spots = sum(1 for s in lot.spots if s.current_status=="A")
             final_list.append({
                 "lot_id": lot.id,
                 "location_name": lot.location_name,
                 "price": lot.price,
                 "total_spots": lot.number_of_spots,
-                "available_spots": available_spots
+                "available_spots": lot.available_spots
             })
-        return {"parking_lots": final_list}, 200
-class User_ReserveSpot(Resource):
-    @user_required
-    def post(self):
-        user = User.query.filter_by(email=get_jwt_identity()).first()
+        return {"parking_lots": final_list}, 200, etag_headers(etag)
 
-        data = request.get_json()
-        lot_id = data.get("lot_id")
-        if not lot_id:
-            return {"message": "lot_id is required"}, 400
 
-        # Pick the lowest available spot explicitly
-        spot = ParkingSpot.query.filter_by(lot_id=lot_id, current_status="A") \
-                .order_by(ParkingSpot.id.asc()).first()
+#------------------- Live Lot Availability (SSE) -------------------
+class User_LotStreamToken(Resource):
+    @user_required
+    def post(self):
+        # Short-lived and good for nothing but opening the stream, since it ends up in URLs (and their logs)
+        user = g.current_user
+        ttl = current_app.config["LOT_STREAM_TOKEN_TTL"]
+        token = create_access_token(
+            identity=user.email,
+            additional_claims={
+                "roles": list(user.roles),
+                "token_uniquifier": user.token_uniquifier,
+                "scope": STREAM_TOKEN_SCOPE
+            },
+            expires_delta=timedelta(seconds=ttl)
+        )
+        return {"stream_token": token, "expires_in": ttl}, 200
 
-        if not spot:
-            return {"message": "No available spots"}, 400
 
-        reservation = Reservation(
-            user_id=user.id,
-            spot_id=spot.id,
-            parking_time=datetime.utcnow(),
-            current_status="active"
+class User_LotStream(Resource):
+    @stream_user_required
+    def get(self):
+        # Resume point: EventSource sends Last-Event-ID on reconnect; ?since= for manual resumes
+        since = request.headers.get("Last-Event-ID") or request.args.get("since")
+        try:
+            since = parse_version_token(since) if since is not None else None
+        except ValueError:
+            since = None   # not one of our ids: start from a snapshot
+
+        try:
+            pubsub, frames, epoch, version = open_lot_stream(since)
+        except redis.RedisError:
+            return {"message": "Live updates unavailable, poll /api/user/view_lots"}, 503
+        db.session.close()   # don't hold a pooled connection for the life of the stream
+
+        stream = lot_event_stream(
+            pubsub, frames, epoch, version,
+            heartbeat=current_app.config["LOT_STREAM_HEARTBEAT"],
+            max_seconds=current_app.config["LOT_STREAM_MAX_SECONDS"]
         )
+        return Response(stream_with_context(stream), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
-        spot.current_status = "O"
-        db.session.add(reservation)
-        db.session.commit()
 
-        return {
-            "message": "Spot reserved successfully",
-            "lot_id": lot_id,
-            "spot_id": spot.id,
-            "parking_time": reservation.parking_time.isoformat()
-        }, 201
-
-#-------------------------reserve spot
+#------------------- Reserve Spot -------------------
 class User_ReserveSpot(Resource):
     @user_required
     def post(self):
-        user = User.query.filter_by(email=get_jwt_identity()).first()
+        user = g.current_user
 
         data = request.get_json()
         lot_id = data.get("lot_id")
         if not lot_id:
             return {"message": "lot_id is required"}, 400
 
-        # pick lowest available spot in this lot
-        spot = ParkingSpot.query.filter_by(lot_id=lot_id, current_status="A") \
-                                .order_by(ParkingSpot.id.asc()).first()
+        # Claim the lowest available spot atomically so concurrent requests never share it
+        try:
+            spot_id = claim_spot(lot_id)
+        except SpotAllocationConflict:
+            db.session.rollback()
+            return {"message": "Parking lot is busy, please try again"}, 409
 
-        if not spot:
+        if not spot_id:
+            db.session.rollback()
             return {"message": "No available spots"}, 400
 
-        # create reservation
         reservation = Reservation(
             user_id=user.id,
-            spot_id=spot.id,
+            spot_id=spot_id,
             parking_time=datetime.utcnow(),
             current_status="active"
         )
-        spot.current_status = "O"
+        adjust_lot_counters(lot_id, available_delta=-1, occupied_delta=1)
         db.session.add(reservation)
         db.session.commit()
+        cache_delete(user_summary_cache_key(user.id))
+        publish_lot_change(lot_id, spot_id=spot_id)
+        invalidate_tags("lots", "users")
 
         return {
             "message": "Spot reserved successfully",
             "lot_id": lot_id,
-            "spot_number": spot.id,
-            "parking_time": reservation.parking_time.isoformat()
+            "spot_id": spot_id,
+            "spot_number": spot_id,
+            "parking_time": reservation.parking_time
         }, 201
 
 #------------------- Release Spot -------------------
 class User_ReleaseSpot(Resource):
     @user_required
     def post(self):
-        user = User.query.filter_by(email=get_jwt_identity()).first()
+        user = g.current_user
         data = request.get_json()
         spot_id = data.get("spot_id")
         if not spot_id:
             return {"message": "spot_id is required"}, 400
 
-        reservation = Reservation.query.filter_by(
-            user_id=user.id, spot_id=spot_id, current_status="active"
+        reservation = db.session.execute(
+            select(Reservation.id, ParkingSpot.lot_id)
+            .join(ParkingSpot, ParkingSpot.id == Reservation.spot_id)
+            .where(Reservation.user_id == user.id, Reservation.spot_id == spot_id,
+                   Reservation.current_status == "active")
         ).first()
         if not reservation:
             return {"message": "No active reservation"}, 404
 
-        reservation.exit_time = datetime.utcnow()
-        reservation.current_status = "completed"
-
-        spot = ParkingSpot.query.get(spot_id)
-        lot = ParkingLot.query.get(spot.lot_id)
-        duration_hours = (reservation.exit_time - reservation.parking_time).total_seconds() / 3600
-        reservation.parking_cost = round(duration_hours * lot.price, 2)
-
-        spot.current_status = "A"
+        # Conditional on status='active', so only one of two concurrent releases completes it
+        exit_time = datetime.utcnow()
+        costs = complete_reservations([reservation.id], exit_time)
+        if len(costs) != 1:
+            db.session.rollback()
+            return {"message": "Reservation was already released"}, 409
+        parking_cost = costs[reservation.id]
+
+        db.session.execute(
+            update(ParkingSpot).where(ParkingSpot.id == spot_id).values(current_status="A")
+            .execution_options(synchronize_session=False)
+        )
+        adjust_lot_counters(reservation.lot_id, available_delta=1, occupied_delta=-1)
+        record_revenue(reservation.lot_id, exit_time.date(), parking_cost)
         db.session.commit()
+        cache_delete(user_summary_cache_key(user.id))
+        publish_lot_change(reservation.lot_id, spot_id=spot_id)
+        invalidate_tags("lots", "users")
 
         return {
             "message": "Spot released successfully",
             "spot_id": spot_id,
-            "exit_time": reservation.exit_time.isoformat(),
-            "parking_cost": reservation.parking_cost
+            "exit_time": exit_time,
+            "parking_cost": parking_cost
+        }, 200
+
+
+#------------------- Bulk Reserve / Release -------------------
+def _id_list(value, limit):
+    """A non-empty list of at most `limit` distinct positive ints, else None."""
+    if not isinstance(value, list) or not 0 < len(value) <= limit:
+        return None
+    if not all(isinstance(v, int) and not isinstance(v, bool) and v > 0 for v in value):
+        return None
+    return list(dict.fromkeys(value))
+
+
+class User_BulkReserve(Resource):
+    """Reserve `count` spots in one transaction: all of them or none.
+
+    {"count": 12, "lot_id": 3} or {"count": 12, "lot_ids": [3, 5]} (filled in that
+    order), plus "contiguous": true for consecutive spot ids within one lot."""
+
+    @user_required
+    def post(self):
+        user = g.current_user
+        data = request.get_json() or {}
+        limit = current_app.config["BULK_RESERVE_MAX"]
+
+        count = data.get("count")
+        if not isinstance(count, int) or isinstance(count, bool) or not 0 < count <= limit:
+            return {"message": f"count must be between 1 and {limit}"}, 400
+        lot_ids = _id_list(data["lot_ids"], limit) if "lot_ids" in data else _id_list([data.get("lot_id")], 1)
+        if not lot_ids:
+            return {"message": "lot_id or a list of lot_ids is required"}, 400
+        contiguous = bool(data.get("contiguous"))
+
+        claimed = {}
+        try:
+            for lot_id in lot_ids:
+                if contiguous:
+                    spot_ids = claim_spots(lot_id, count, contiguous=True)
+                else:
+                    spot_ids = claim_spots(lot_id, count - sum(map(len, claimed.values())))
+                if spot_ids:
+                    claimed[lot_id] = spot_ids
+                if sum(map(len, claimed.values())) == count:
+                    break
+        except SpotAllocationConflict:
+            db.session.rollback()
+            return {"message": "Parking lots are busy, please try again"}, 409
+
+        if sum(map(len, claimed.values())) < count:
+            db.session.rollback()
+            what = f"{count} consecutive available spots" if contiguous else f"{count} available spots"
+            return {"message": f"Not enough spots: the requested lots don't have {what}"}, 400
+
+        parking_time = datetime.utcnow()
+        reservations = db.session.execute(
+            insert(Reservation).returning(Reservation.id, Reservation.spot_id),
+            [{"user_id": user.id, "spot_id": spot_id, "parking_time": parking_time, "current_status": "active"}
+             for spot_ids in claimed.values() for spot_id in spot_ids]
+        ).all()
+        for lot_id, spot_ids in sorted(claimed.items()):
+            adjust_lot_counters(lot_id, available_delta=-len(spot_ids), occupied_delta=len(spot_ids))
+        db.session.commit()
+        cache_delete(user_summary_cache_key(user.id))
+        for lot_id, spot_ids in claimed.items():
+            publish_lot_change(lot_id, spot_ids=spot_ids)
+        invalidate_tags("lots", "users")
+
+        lot_of = {spot_id: lot_id for lot_id, spot_ids in claimed.items() for spot_id in spot_ids}
+        return {
+            "message": f"{count} spots reserved successfully",
+            "parking_time": parking_time,
+            "reservations": [
+                {"reservation_id": res_id, "lot_id": lot_of[spot_id], "spot_id": spot_id}
+                for res_id, spot_id in sorted(reservations, key=lambda row: row.spot_id)
+            ]
+        }, 201
+
+
+class User_BulkRelease(Resource):
+    """Release several spots in one transaction: {"spot_ids": [...]}, all or none."""
+
+    @user_required
+    def post(self):
+        user = g.current_user
+        data = request.get_json() or {}
+        spot_ids = _id_list(data.get("spot_ids"), current_app.config["BULK_RESERVE_MAX"])
+        if not spot_ids:
+            return {"message": "spot_ids must be a list of spot ids"}, 400
+
+        active = db.session.execute(
+            select(Reservation.id, Reservation.spot_id, ParkingSpot.lot_id)
+            .join(ParkingSpot, ParkingSpot.id == Reservation.spot_id)
+            .where(Reservation.user_id == user.id, Reservation.spot_id.in_(spot_ids),
+                   Reservation.current_status == "active")
+        ).all()
+        missing = sorted(set(spot_ids) - {row.spot_id for row in active})
+        if missing:
+            return {"message": "No active reservation for some spots", "spot_ids": missing}, 404
+
+        exit_time = datetime.utcnow()
+        costs = complete_reservations([row.id for row in active], exit_time)
+        if len(costs) < len(active):
+            db.session.rollback()
+            return {"message": "Some spots were released concurrently, please try again"}, 409
+
+        db.session.execute(
+            update(ParkingSpot).where(ParkingSpot.id.in_(spot_ids)).values(current_status="A")
+            .execution_options(synchronize_session=False)
+        )
+        by_lot = {}
+        for row in active:
+            by_lot.setdefault(row.lot_id, []).append(row)
+        for lot_id, rows in sorted(by_lot.items()):
+            adjust_lot_counters(lot_id, available_delta=len(rows), occupied_delta=-len(rows))
+            record_revenue(lot_id, exit_time.date(), sum(costs[row.id] for row in rows), bookings=len(rows))
+        db.session.commit()
+        cache_delete(user_summary_cache_key(user.id))
+        for lot_id, rows in by_lot.items():
+            publish_lot_change(lot_id, spot_ids=[row.spot_id for row in rows])
+        invalidate_tags("lots", "users")
+
+        return {
+            "message": f"{len(active)} spots released successfully",
+            "exit_time": exit_time,
+            "total_cost": round(sum(costs.values()), 2),
+            "released": [
+                {"reservation_id": row.id, "spot_id": row.spot_id, "parking_cost": costs[row.id]}
+                for row in sorted(active, key=lambda row: row.spot_id)
+            ]
         }, 200
 
 
@@ -138,21 +313,17 @@ class User_ReleaseSpot(Resource):
 class User_ParkHistory(Resource):
     @user_required
     def get(self):
-        user = User.query.filter_by(email=get_jwt_identity()).first()
-        reservations = Reservation.query.filter_by(user_id=user.id).order_by(Reservation.parking_time.desc()).all()
-        history = []
-        for res in reservations:
-            spot = ParkingSpot.query.get(res.spot_id)
-            lot = ParkingLot.query.get(spot.lot_id) if spot else None
-            history.append({
-                "reservation_id": res.id,
-                "lot_name": lot.location_name if lot else None,
-                "spot_id": spot.id if spot else None,
-                "parking_time": res.parking_time.isoformat() if res.parking_time else None,
-                "exit_time": res.exit_time.isoformat() if res.exit_time else None,
-                "status": res.current_status,
-                "parking_cost": res.parking_cost or 0
-            })
+        user = g.current_user
+        rows = db.session.execute(newest_first(booking_rows(user_id=user.id))).all()
+        history = [{
+            "reservation_id": row.reservation_id,
+            "lot_name": row.lot_name,
+            "spot_id": row.spot_id,
+            "parking_time": row.parking_time,
+            "exit_time": row.exit_time,
+            "status": row.status,
+            "parking_cost": row.parking_cost or 0
+        } for row in rows]
         return {"parking_history": history}, 200
 
 
@@ -160,31 +331,12 @@ class User_ParkHistory(Resource):
 class User_Summary(Resource):
     @user_required
     def get(self):
-        user = User.query.filter_by(email=get_jwt_identity()).first()
-        reservations = Reservation.query.filter_by(user_id=user.id).all()
-
-        total_parks = len(reservations)
-        total_hours = 0
-        total_cost = 0
-        lot_usage = {}
-
-        for res in reservations:
-            if res.exit_time:
-                duration = (res.exit_time - res.parking_time).total_seconds() / 3600
-                total_hours += duration
-                total_cost += res.parking_cost
-                spot = ParkingSpot.query.get(res.spot_id)
-                lot = ParkingLot.query.get(spot.lot_id) if spot else None
-                if lot:
-                    lot_usage[lot.location_name] = lot_usage.get(lot.location_name, 0) + 1
-
-        summary = {
-            "total_parks": total_parks,
-            "total_hours": round(total_hours, 2),
-            "total_cost": round(total_cost, 2),
-            "lot_usage": lot_usage
-        }
-
+        user = g.current_user
+        key = user_summary_cache_key(user.id)
+        summary = cache_get(key)
+        if summary is None:
+            summary = user_summary(user.id)
+            cache_set(key, summary, current_app.config["USER_SUMMARY_CACHE_TTL"])
         return summary, 200
 
 
@@ -192,29 +344,19 @@ class User_Summary(Resource):
 class User_CSVExport(Resource):
     @user_required
     def get(self):
-        user = User.query.filter_by(email=get_jwt_identity()).first()
-        reservations = Reservation.query.filter_by(user_id=user.id).all()
-
-        output = StringIO()
-        writer = csv.writer(output)
-        writer.writerow(["Reservation ID", "Lot Name", "Spot ID", "Parking Time", "Exit Time", "Status", "Cost"])
-
-        for res in reservations:
-            spot = ParkingSpot.query.get(res.spot_id)
-            lot = ParkingLot.query.get(spot.lot_id) if spot else None
-            writer.writerow([
-                res.id,
-                lot.location_name if lot else "",
-                spot.id if spot else "",
-                res.parking_time.isoformat() if res.parking_time else "",
-                res.exit_time.isoformat() if res.exit_time else "",
-                res.current_status,
-                res.parking_cost or 0
-            ])
-
-        output.seek(0)
-        return send_file(output, mimetype="text/csv", attachment_filename="parking_history.csv", as_attachment=True)
-
-
-
-
+        user = g.current_user
+        query = by_id(booking_rows(user_id=user.id))
+
+        def to_values(row):
+            return [
+                row.reservation_id,
+                row.lot_name or "",
+                row.spot_id or "",
+                row.parking_time.isoformat() if row.parking_time else "",
+                row.exit_time.isoformat() if row.exit_time else "",
+                row.status,
+                row.parking_cost or 0
+            ]
+
+        header = ["Reservation ID", "Lot Name", "Spot ID", "Parking Time", "Exit Time", "Status", "Cost"]
+        return csv_response("parking_history.csv", iter_csv(header, query, to_values))
@@ -0,0 +1,95 @@
+import gzip
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from flask import current_app, make_response, request
+
+try:
+    import orjson
+except ImportError:      # optional: pip install orjson
+    orjson = None
+
+try:
+    import brotli
+except ImportError:      # optional: pip install brotli
+    brotli = None
+
+
+# ------------------------ JSON encoding ------------------------
+# Resources may return datetimes as-is; they are written as ISO 8601, exactly
+# what .isoformat() gave (naive values carry no offset).
+def _default(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def stdlib_dumps(data):
+    """Compact JSON as bytes, with the standard library."""
+    return json.dumps(data, default=_default, separators=(",", ":")).encode()
+
+
+def orjson_dumps(data):
+    """Same output as stdlib_dumps, several times faster; needs orjson."""
+    return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+dumps = orjson_dumps if orjson is not None else stdlib_dumps
+loads = orjson.loads if orjson is not None else json.loads
+
+
+# ------------------------ Compression ------------------------
+def _encodings():
+    """Encodings this process can produce, best first."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding():
+    """The best encoding the client accepts (q > 0), or None for identity."""
+    accepted = request.accept_encodings
+    for encoding in _encodings():
+        if accepted[encoding] > 0:
+            return encoding
+    return None
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=current_app.config["RESPONSE_BROTLI_QUALITY"])
+    return gzip.compress(body, compresslevel=current_app.config["RESPONSE_GZIP_LEVEL"], mtime=0)
+
+
+# ------------------------ flask_restful representation ------------------------
+def compressible(body):
+    """The encoding to send `body` (dumps() output) with, or None for identity:
+    only bodies of RESPONSE_COMPRESS_MIN_BYTES or more are compressed."""
+    if len(body) < current_app.config["RESPONSE_COMPRESS_MIN_BYTES"]:
+        return None
+    return negotiate_encoding()
+
+
+def json_response(body, code, headers=None, encoding=None):
+    """Response for an encoded JSON body, already compressed with `encoding` if set."""
+    response = make_response(body, code)
+    response.headers.extend(headers or {})
+    response.mimetype = "application/json"
+    response.vary.add("Accept-Encoding")
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+        # The compressed bytes differ from the identity body: a strong ETag can't cover both
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+    return response
+
+
+def output_json(data, code, headers=None):
+    """Api.representation for application/json: dumps() the resource's result and
+    compresses bodies of RESPONSE_COMPRESS_MIN_BYTES or more when the client allows."""
+    body = dumps(data)
+    encoding = compressible(body)
+    if encoding:
+        body = compress(body, encoding)
+    return json_response(body, code, headers, encoding)
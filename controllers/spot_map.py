@@ -0,0 +1,54 @@
+import base64
+from sqlalchemy import select
+from controllers.database import db
+from controllers.models import ParkingSpot
+
+SPOT_FORMATS = ("full", "compact")
+
+
+# ------------------------ Spot rows ------------------------
+def spots_by_lot(lot_ids=None):
+    """{lot_id: [(spot_id, status), ...]} in spot id order, from one query."""
+    query = select(ParkingSpot.lot_id, ParkingSpot.id, ParkingSpot.current_status) \
+        .order_by(ParkingSpot.lot_id, ParkingSpot.id)
+    if lot_ids is not None:
+        query = query.where(ParkingSpot.lot_id.in_(lot_ids))
+    spots = {}
+    for lot_id, spot_id, status in db.session.execute(query):
+        spots.setdefault(lot_id, []).append((spot_id, status))
+    return spots
+
+
+def spot_statuses(spot_ids):
+    """{spot_id: status} for just these spots (deleted ones are absent)."""
+    if not spot_ids:
+        return {}
+    rows = db.session.execute(
+        select(ParkingSpot.id, ParkingSpot.current_status).where(ParkingSpot.id.in_(spot_ids))
+    )
+    return dict(rows.all())
+
+
+# ------------------------ Encodings ------------------------
+def encode_spot_map(spots):
+    """Compact form of a lot's [(spot_id, status)] in id order.
+
+    id_runs lists the spot ids as [first_id, count] ranges (one per create/resize,
+    usually). occupied is a base64 bitmap over the spots in that order, most
+    significant bit first: bit i set means the i-th spot is occupied.
+    """
+    runs = []
+    bits = bytearray((len(spots) + 7) // 8)
+    for i, (spot_id, status) in enumerate(spots):
+        if runs and runs[-1][0] + runs[-1][1] == spot_id:
+            runs[-1][1] += 1
+        else:
+            runs.append([spot_id, 1])
+        if status != "A":
+            bits[i // 8] |= 0x80 >> (i % 8)
+    return {"id_runs": runs, "occupied": base64.b64encode(bytes(bits)).decode("ascii")}
+
+
+def spot_list(spots):
+    """The original one-object-per-spot form."""
+    return [{"spot_id": spot_id, "status": "Available" if status == "A" else "Occupied"} for spot_id, status in spots]
@@ -1,10 +1,6 @@
-from app import create_app
-from controllers.database import db
+from app import app, provision
 
 print("🔧 Fixing Database...")
-app, _ = create_app()
-
-with app.app_context():
-    db.create_all()
-    print("ALL TABLES CREATED: users, roles, user_roles, parking_lots, parking_spots, RESERVATIONS")
-    print("Admin user ready: adminmail@gmail.com / adminpss")
+provision(app)
+print("ALL TABLES MIGRATED: users, roles, user_roles, parking_lots, parking_spots, RESERVATIONS")
+print("Admin user ready: adminmail@gmail.com / adminpss")
@@ -1,21 +1,107 @@
 # mail.py
 import smtplib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.text import MIMEText
+from queue import Queue
 
 SMTP_HOST = "localhost"  # MailHog
 SMTP_PORT = 1025         # MailHog port
 FROM_EMAIL = "admin@example.com"
 
-def send_mail(to_email, subject, body):
-    msg = MIMEText(body)
+SMTP_TIMEOUT = 10              # seconds per SMTP command
+MESSAGES_PER_CONNECTION = 100  # reconnect after this many, servers cap long sessions
+BULK_CONCURRENCY = 4           # parallel SMTP connections for a batch
+
+DeliveryResult = namedtuple("DeliveryResult", "to_email ok error")
+
+
+def build_message(to_email, subject, body, subtype="plain"):
+    msg = MIMEText(body, subtype, "utf-8")
     msg["Subject"] = subject
     msg["From"] = FROM_EMAIL
     msg["To"] = to_email
+    return msg
+
+
+# ------------------------ Connection pool ------------------------
+class SMTPPool:
+    """Up to `size` persistent SMTP connections, opened on first use and reused
+    across messages instead of paying TCP + greeting per email."""
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, size=BULK_CONCURRENCY):
+        self.host = host
+        self.port = port
+        self._idle = Queue()
+        for _ in range(size):
+            self._idle.put(None)   # placeholder: connect lazily
+
+    def _connect(self):
+        conn = smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT)
+        conn.sent_count = 0
+        return conn
+
+    @staticmethod
+    def _discard(conn):
+        if conn is not None:
+            try:
+                conn.quit()
+            except (smtplib.SMTPException, OSError):
+                conn.close()
+
+    def send(self, msg):
+        """Send one message on a pooled connection, reconnecting once if it dropped."""
+        conn = self._idle.get()
+        try:
+            for attempt in (1, 2):
+                if conn is None or conn.sent_count >= MESSAGES_PER_CONNECTION:
+                    self._discard(conn)
+                    conn = None
+                    conn = self._connect()
+                try:
+                    conn.sendmail(FROM_EMAIL, [msg["To"]], msg.as_string())
+                    conn.sent_count += 1
+                    return
+                except (smtplib.SMTPServerDisconnected, ConnectionError):
+                    # Stale or dropped connection: open a fresh one and retry once
+                    self._discard(conn)
+                    conn = None
+                    if attempt == 2:
+                        raise
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        while not self._idle.empty():
+            self._discard(self._idle.get())
+
+
+# ------------------------ Sending ------------------------
+def send_bulk_mail(messages, concurrency=BULK_CONCURRENCY, host=SMTP_HOST, port=SMTP_PORT):
+    """Send (to_email, subject, body[, subtype]) tuples over `concurrency` persistent
+    connections. Returns one DeliveryResult per message, in input order; a failure
+    for one recipient never stops the rest."""
+    pool = SMTPPool(host, port, size=concurrency)
+
+    def deliver(message):
+        to_email = message[0]
+        try:
+            pool.send(build_message(*message))
+            return DeliveryResult(to_email, True, None)
+        except (smtplib.SMTPException, OSError) as e:
+            return DeliveryResult(to_email, False, str(e))
 
     try:
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-            server.sendmail(FROM_EMAIL, [to_email], msg.as_string())
-            print(f"Email sent to {to_email}")
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="smtp") as executor:
+            return list(executor.map(deliver, messages))
+    finally:
+        pool.close()
+
 
-    except Exception as e:
-        print("Mail error:", e)
+def send_mail(to_email, subject, body, subtype="plain"):
+    result = send_bulk_mail([(to_email, subject, body, subtype)], concurrency=1)[0]
+    if result.ok:
+        print(f"Email sent to {to_email}")
+    else:
+        print("Mail error:", result.error)
+    return result.ok
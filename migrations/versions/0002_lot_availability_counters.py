@@ -0,0 +1,37 @@
+"""lot availability counters
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 12:32:14.504667
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('parking_lots', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('available_spots', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('occupied_spots', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill from parking_spots (same as `flask recount-spots`)
+    op.execute("""
+        UPDATE parking_lots SET
+            available_spots = (SELECT COUNT(*) FROM parking_spots s
+                               WHERE s.lot_id = parking_lots.id AND s.current_status = 'A'),
+            occupied_spots = (SELECT COUNT(*) FROM parking_spots s
+                              WHERE s.lot_id = parking_lots.id AND s.current_status = 'O')
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('parking_lots', schema=None) as batch_op:
+        batch_op.drop_column('occupied_spots')
+        batch_op.drop_column('available_spots')
@@ -0,0 +1,26 @@
+"""lot revision
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 13:24:51.308412
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('parking_lots', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('revision', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('parking_lots', schema=None) as batch_op:
+        batch_op.drop_column('revision')
@@ -0,0 +1,42 @@
+"""revenue rollups keep deleted lots
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 14:02:37.615204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+# 0004 left the foreign key unnamed; SQLite batch mode needs a name to drop it
+NAMING_CONVENTION = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+SQLITE_FK_NAME = "fk_revenue_rollups_lot_id_parking_lots"
+
+
+def _lot_fk_name():
+    for fk in sa.inspect(op.get_bind()).get_foreign_keys('revenue_rollups'):
+        if fk['referred_table'] == 'parking_lots':
+            return fk['name'] or SQLITE_FK_NAME
+    return None
+
+
+def upgrade():
+    # Revenue of a deleted lot moves to lot_id 0 instead of being deleted with it
+    name = _lot_fk_name()
+    if name is None:
+        return
+    with op.batch_alter_table('revenue_rollups', schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.drop_constraint(name, type_='foreignkey')
+
+
+def downgrade():
+    op.execute("DELETE FROM revenue_rollups WHERE lot_id NOT IN (SELECT id FROM parking_lots)")
+    with op.batch_alter_table('revenue_rollups', schema=None) as batch_op:
+        batch_op.create_foreign_key(SQLITE_FK_NAME, 'parking_lots', ['lot_id'], ['id'])
@@ -1,7 +1,10 @@
-from celery_app import celery_app
-from mail import send_mail
-from sqlalchemy import create_engine, text
-from datetime import date
+from celery_app import celery_app, get_engine
+from controllers.config import Config
+from celery import chord
+from mail import send_bulk_mail
+from sqlalchemy import text, bindparam, DateTime
+from sqlalchemy.exc import OperationalError, InterfaceError
+from datetime import date, datetime, timedelta
 from jinja2 import Environment, FileSystemLoader, select_autoescape
 import os
 
@@ -12,25 +15,170 @@ env = Environment(
     autoescape=select_autoescape(['html', 'xml'])
 )
 
-DB_PATH = "sqlite:///instance/parkxcel.db"
+CAMPAIGN_CHUNK_SIZE = 500     # users per chunk task
+CHUNK_MAX_RETRIES = 3
+# Lost connections, failovers, lock timeouts: worth another try of the whole chunk
+TRANSIENT_DB_ERRORS = (OperationalError, InterfaceError)
+
+ACTIVE_USER_IDS = text("""
+    SELECT u.id FROM users u
+    JOIN user_roles ur ON u.id=ur.user_id
+    JOIN roles r ON ur.role_id=r.id
+    WHERE r.name='user' AND u.active=:active AND u.id > :after_id
+    ORDER BY u.id
+    LIMIT :limit
+""")
+
+USERS_BY_ID = text("""
+    SELECT u.id, u.email, u.name FROM users u
+    WHERE u.id IN :user_ids AND u.active=:active
+    ORDER BY u.id
+""").bindparams(bindparam("user_ids", expanding=True))
+
+# Hours parked for a completed reservation, per dialect
+PARKED_HOURS = {
+    "postgresql": "EXTRACT(EPOCH FROM (r.exit_time - r.parking_time)) / 3600.0",
+    "sqlite": "(julianday(r.exit_time) - julianday(r.parking_time)) * 24.0",
+}
+
+# One pass for a whole chunk: the month's bookings from both the hot and archive
+# tables, usage grouped per (user, lot), per-user totals and the top lot picked
+# with window functions, LEFT JOINed so idle users still get a row.
+MONTHLY_USAGE = """
+    WITH month_reservations AS (
+        SELECT user_id, spot_id, parking_time, exit_time, parking_cost FROM reservations
+        WHERE user_id IN :user_ids AND parking_time >= :month_start AND parking_time < :month_end
+        UNION ALL
+        SELECT user_id, spot_id, parking_time, exit_time, parking_cost FROM reservations_archive
+        WHERE user_id IN :user_ids AND parking_time >= :month_start AND parking_time < :month_end
+    ), per_lot AS (
+        SELECT r.user_id, l.id AS lot_id, l.location_name,
+               COUNT(*) AS bookings,
+               SUM(COALESCE(r.parking_cost, 0)) AS amount,
+               SUM(CASE WHEN r.exit_time IS NOT NULL THEN {hours} ELSE 0 END) AS hours
+        FROM month_reservations r
+        JOIN parking_spots s ON s.id=r.spot_id
+        JOIN parking_lots l ON l.id=s.lot_id
+        GROUP BY r.user_id, l.id, l.location_name
+    ), ranked AS (
+        SELECT user_id, location_name,
+               SUM(bookings) OVER (PARTITION BY user_id) AS total_bookings,
+               SUM(amount) OVER (PARTITION BY user_id) AS total_amount,
+               SUM(hours) OVER (PARTITION BY user_id) AS total_hours,
+               ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY bookings DESC, lot_id) AS lot_rank
+        FROM per_lot
+    )
+    SELECT u.id, u.email, u.name,
+           COALESCE(ranked.total_bookings, 0) AS total_bookings,
+           COALESCE(ranked.total_amount, 0) AS total_amount,
+           COALESCE(ranked.total_hours, 0) AS total_hours,
+           ranked.location_name AS most_used_lot
+    FROM users u
+    LEFT JOIN ranked ON ranked.user_id=u.id AND ranked.lot_rank=1
+    WHERE u.id IN :user_ids AND u.active=:active
+    ORDER BY u.id
+"""
+
+
+ARCHIVE_COLUMNS = "id, user_id, spot_id, parking_time, exit_time, parking_cost, current_status"
+
+# Never the newest row: SQLite hands out MAX(id) + 1 for the next reservation, and an
+# id already in the archive must not be reused
+ARCHIVE_CANDIDATES = text("""
+    SELECT id FROM reservations
+    WHERE current_status='completed' AND exit_time < :cutoff
+      AND id < (SELECT MAX(id) FROM reservations)
+    LIMIT :limit
+""").bindparams(bindparam("cutoff", type_=DateTime))
+
+COPY_TO_ARCHIVE = text(f"""
+    INSERT INTO reservations_archive ({ARCHIVE_COLUMNS})
+    SELECT {ARCHIVE_COLUMNS} FROM reservations WHERE id IN :ids
+""").bindparams(bindparam("ids", expanding=True))
+
+DELETE_ARCHIVED = text("""
+    DELETE FROM reservations WHERE id IN :ids
+""").bindparams(bindparam("ids", expanding=True))
+
+
+# ------------------------ Campaign plumbing ------------------------
+def active_user_id_chunks(chunk_size=CAMPAIGN_CHUNK_SIZE):
+    """Yield lists of active user ids, paging by id so no query reads the whole table."""
+    after_id = 0
+    with get_engine().connect() as conn:
+        while True:
+            ids = [row.id for row in conn.execute(
+                ACTIVE_USER_IDS, {"active": True, "after_id": after_id, "limit": chunk_size}
+            )]
+            if not ids:
+                return
+            yield ids
+            after_id = ids[-1]
+
+
+def fan_out(task, campaign, chunk_task, **chunk_kwargs):
+    """Dispatch one chunk subtask per page of users as a chord whose callback
+    aggregates the per-chunk counts. Progress is visible in the result backend:
+    this task's PROGRESS meta (chunks planned so far) while paging users, then the group's completed count."""
+    signatures = []
+    for ids in active_user_id_chunks():
+        signatures.append(chunk_task.s(ids, **chunk_kwargs))
+        task.update_state(state="PROGRESS", meta={"campaign": campaign, "chunks_planned": len(signatures)})
+    if not signatures:
+        return {"campaign": campaign, "chunks": 0, "sent": 0, "failed": 0}
+
+    result = chord(signatures)(summarize_campaign.s(campaign))
+    return {
+        "campaign": campaign,
+        "chunks": len(signatures),
+        "group_id": result.parent.id if result.parent is not None else None,
+        "summary_task_id": result.id
+    }
+
+
+def deliver_chunk(task, messages, sent_before):
+    """Send a chunk's messages; if any failed, retry the chunk with only those
+    recipients so nobody gets the same email twice. Returns the chunk's counts."""
+    results = send_bulk_mail([message for _, message in messages])
+    sent = sent_before + sum(1 for r in results if r.ok)
+    failed_ids = [user_id for (user_id, _), r in zip(messages, results) if not r.ok]
+
+    if failed_ids and task.request.retries < CHUNK_MAX_RETRIES:
+        raise task.retry(args=[failed_ids], kwargs={**task.request.kwargs, "sent_before": sent},
+                         countdown=30 * (task.request.retries + 1))
+    for r in results:
+        if not r.ok:
+            print(f" Failed to send to {r.to_email}: {r.error}")
+    return {"sent": sent, "failed": len(failed_ids)}
 
-@celery_app.task(name="tasks.sendparkingreminders")
-def sendparkingreminders():
-    """Simple TEXT daily reminder sent to all active users."""
-    engine = create_engine(DB_PATH)
-    
-    with engine.connect() as conn:
-        result = conn.execute(text("""
-            SELECT u.email, u.name FROM users u
-            JOIN user_roles ur ON u.id=ur.user_id
-            JOIN roles r ON ur.role_id=r.id
-            WHERE r.name='user' AND u.active=1
-        """))
-        users = result.fetchall()
 
+def load_users(user_ids):
+    with get_engine().connect() as conn:
+        return conn.execute(USERS_BY_ID, {"user_ids": user_ids, "active": True}).fetchall()
+
+
+@celery_app.task(name="tasks.summarize_campaign")
+def summarize_campaign(chunk_results, campaign):
+    """Chord callback: totals across every chunk of a campaign."""
+    sent = sum(r["sent"] for r in chunk_results)
+    failed = sum(r["failed"] for r in chunk_results)
+    print(f" {campaign}: {sent} sent, {failed} failed across {len(chunk_results)} chunks")
+    return {"campaign": campaign, "chunks": len(chunk_results), "sent": sent, "failed": failed}
+
+
+# ------------------------ Daily reminders ------------------------
+@celery_app.task(name="tasks.sendparkingreminders", bind=True)
+def sendparkingreminders(self):
+    """Simple TEXT daily reminder sent to all active users, one chunk task per page of users."""
+    return fan_out(self, "daily reminders", send_reminder_chunk)
+
+
+@celery_app.task(name="tasks.send_reminder_chunk", bind=True, max_retries=CHUNK_MAX_RETRIES,
+                 autoretry_for=TRANSIENT_DB_ERRORS, retry_backoff=30)
+def send_reminder_chunk(self, user_ids, sent_before=0):
     today = date.today()
-    sent_count = 0
-    for email, name in users:
+    messages = []
+    for user_id, email, name in load_users(user_ids):
         body = f"""PARKXCEL DAILY PARKING REMINDER
 
 Hi {name},
@@ -41,45 +189,86 @@ Book YOUR SPOT NOW!
 
 ParkXcel Team 💙
 """
-        try:
-            send_mail(email, f"Daily Reminder - {today.strftime('%d %b')}", body)
-            sent_count += 1
-            print(f" Sent to {name}")
-        except Exception as e:
-            print(f" Failed to send to {name}: {e}")
-    
-    return f" {sent_count} daily reminders sent!"
-
-@celery_app.task(name="tasks.send_monthly_parking_report")
-def send_monthly_parking_report():
-    """HTML monthly report sent to all active users."""
-    engine = create_engine(DB_PATH)
-    
+        messages.append((user_id, (email, f"Daily Reminder - {today.strftime('%d %b')}", body)))
+    return deliver_chunk(self, messages, sent_before)
+
+
+# ------------------------ Archiving ------------------------
+def archive_completed_reservations(engine, cutoff, batch_size, max_batches):
+    """Move completed reservations that ended before `cutoff` to reservations_archive,
+    `batch_size` rows per transaction (copy then delete, so a failed batch leaves them
+    in place), for at most `max_batches` batches. Returns the number of rows moved."""
+    moved = 0
+    for _ in range(max_batches):
+        with engine.begin() as conn:
+            ids = conn.execute(ARCHIVE_CANDIDATES, {"cutoff": cutoff, "limit": batch_size}).scalars().all()
+            if ids:
+                conn.execute(COPY_TO_ARCHIVE, {"ids": ids})
+                conn.execute(DELETE_ARCHIVED, {"ids": ids})
+        moved += len(ids)
+        if len(ids) < batch_size:
+            break
+    return moved
+
+
+@celery_app.task(name="tasks.archive_reservations")
+def archive_reservations():
+    """Keep `reservations` to active and recent bookings (runs nightly from beat)."""
+    cutoff = datetime.utcnow() - timedelta(days=Config.ARCHIVE_AFTER_DAYS)
+    moved = archive_completed_reservations(
+        get_engine(), cutoff, Config.ARCHIVE_BATCH_SIZE, Config.ARCHIVE_MAX_BATCHES
+    )
+    return {"archived": moved, "cutoff": cutoff.isoformat()}
+
+
+# ------------------------ Monthly report ------------------------
+def previous_month(today=None):
+    """(first day, first day of the next month) of the calendar month before `today`."""
+    this_month = (today or date.today()).replace(day=1)
+    return (this_month - timedelta(days=1)).replace(day=1), this_month
+
+
+def monthly_usage(user_ids, month_start):
+    """Each user's bookings, spend, hours and most-used lot for the month starting
+    at `month_start`, for a whole chunk of users in one query."""
+    month_end = (month_start + timedelta(days=32)).replace(day=1)
+    engine = get_engine()
+    query = text(MONTHLY_USAGE.format(hours=PARKED_HOURS[engine.dialect.name])).bindparams(
+        bindparam("user_ids", expanding=True),
+        bindparam("month_start", type_=DateTime),
+        bindparam("month_end", type_=DateTime)
+    )
     with engine.connect() as conn:
-        result = conn.execute(text("""
-            SELECT u.email, u.name FROM users u
-            JOIN user_roles ur ON u.id=ur.user_id
-            JOIN roles r ON ur.role_id=r.id
-            WHERE r.name='user' AND u.active=1
-        """))
-        users = result.fetchall()
-    
+        return conn.execute(query, {
+            "user_ids": user_ids,
+            "active": True,
+            "month_start": datetime.combine(month_start, datetime.min.time()),
+            "month_end": datetime.combine(month_end, datetime.min.time())
+        }).fetchall()
+
+
+@celery_app.task(name="tasks.send_monthly_parking_report", bind=True)
+def send_monthly_parking_report(self):
+    """HTML report of last month's parking sent to all active users, one chunk task per page of users."""
+    month_start, _ = previous_month()
+    return fan_out(self, "monthly reports", send_monthly_report_chunk, month=month_start.isoformat())
+
+
+@celery_app.task(name="tasks.send_monthly_report_chunk", bind=True, max_retries=CHUNK_MAX_RETRIES,
+                 autoretry_for=TRANSIENT_DB_ERRORS, retry_backoff=30)
+def send_monthly_report_chunk(self, user_ids, month=None, sent_before=0):
+    month_start = date.fromisoformat(month) if month else previous_month()[0]
+    month_year = month_start.strftime('%B %Y')
     template = env.get_template('monthly_report.html')
-    sent_count = 0
-    for email, name in users:
-        # Fill template variables here as needed or static placeholders
+    messages = []
+    for row in monthly_usage(user_ids, month_start):
         html_body = template.render(
-            user_name=name,
-            month_year=date.today().strftime('%B %Y'),
-            total_bookings=10,
-            total_amount=1500,
-            most_used_lot="Central Mall"
+            user_name=row.name,
+            month_year=month_year,
+            total_bookings=row.total_bookings,
+            total_amount=round(row.total_amount, 2),
+            total_hours=round(row.total_hours, 1),
+            most_used_lot=row.most_used_lot or "-"
         )
-        try:
-            send_mail(email, f"📊 Monthly Parking Report - {date.today().strftime('%B %Y')}", html_body)
-            sent_count += 1
-            print(f" Monthly report sent to {name}")
-        except Exception as e:
-            print(f" Failed monthly report to {name}: {e}")
-    
-    return f" {sent_count} monthly reports sent!"
+        messages.append((row.id, (row.email, f"📊 Monthly Parking Report - {month_year}", html_body, "html")))
+    return deliver_chunk(self, messages, sent_before)
@@ -0,0 +1,18 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app.py reads DATABASE_URL at import: a throwaway SQLite file unless one is given
+# (point it at a scratch PostgreSQL database to exercise that planner and SKIP LOCKED)
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "tests.db"))
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app import app, provision
+    provision(app)
+    return app
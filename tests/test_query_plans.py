@@ -0,0 +1,209 @@
+"""Query-plan regression check for the API's hot queries.
+
+Seeds the test database, drives every endpoint through the Flask test client
+while capturing the SQL it issues, then EXPLAINs each statement and fails if any
+of them falls back to a full table scan that the endpoint is not expected to
+make (listing every lot is O(lots) by design; looking up one user's bookings is
+not).
+
+    python -m pytest tests/test_query_plans.py                  # throwaway SQLite file
+    DATABASE_URL=postgresql://... python -m pytest tests/test_query_plans.py
+
+SQLite plans come from EXPLAIN QUERY PLAN ("SCAN <table>" without an index is a
+full scan). PostgreSQL plans come from EXPLAIN (FORMAT JSON) with enable_seqscan
+off, so a "Seq Scan" node means no usable index exists.
+"""
+import json
+from datetime import datetime, timedelta
+
+# Tables each endpoint may legitimately read end to end
+ALLOWED_SCANS = {
+    "GET /api/user/view_lots": {"parking_lots"},
+    "GET /api/admin/view_lots": {"parking_lots", "parking_spots"},
+    "GET /api/admin/view_users": {"users"},
+    "GET /api/admin/summary": {"parking_lots", "users", "revenue_rollups"},
+    "GET /api/admin/revenue_bylot": {"parking_lots", "revenue_rollups"},
+    "GET /api/admin/export_csv": {"reservations", "reservations_archive"},
+}
+
+
+PLAN_PASSWORD = "plan-password"
+
+
+def seed(db, models, lots=20, spots_per_lot=50, users=200, reservations=5000):
+    """Seed users, lots and booking history; returns the id of an extra lot whose
+    spots have no history, so edit_lot can shrink it."""
+    from werkzeug.security import generate_password_hash
+    from controllers.passwords import hash_password
+    from controllers.user_datastore import user_datastore
+    ParkingLot, ParkingSpot, Reservation = models
+
+    # One real hash shared by everyone; plan1's predates the policy, so logging in rehashes it
+    password = hash_password(PLAN_PASSWORD)
+    legacy_password = generate_password_hash(PLAN_PASSWORD, method="pbkdf2:sha256:1000")
+    user_role = user_datastore.find_or_create_role("user", description="Regular user role")
+    user_ids = []
+    for i in range(users):
+        user = user_datastore.create_user(name=f"plan{i}", email=f"plan{i}@example.com",
+                                          password=legacy_password if i == 1 else password, roles=[user_role])
+        db.session.flush()
+        user_ids.append(user.id)
+
+    spot_ids = []
+    for i in range(lots):
+        lot = ParkingLot(location_name=f"Lot {i}", price=10 + i, pin_code="000000",
+                         number_of_spots=spots_per_lot, available_spots=spots_per_lot, occupied_spots=0)
+        db.session.add(lot)
+        db.session.flush()
+        spots = [ParkingSpot(lot_id=lot.id, current_status="A") for _ in range(spots_per_lot)]
+        db.session.add_all(spots)
+        db.session.flush()
+        spot_ids.extend(s.id for s in spots)
+
+    start = datetime.utcnow() - timedelta(days=365)
+    for i in range(reservations):
+        parked = start + timedelta(minutes=97 * i)
+        db.session.add(Reservation(
+            user_id=user_ids[i % len(user_ids)], spot_id=spot_ids[(i * 7) % len(spot_ids)],
+            parking_time=parked, exit_time=parked + timedelta(hours=2),
+            parking_cost=20.0, current_status="completed"
+        ))
+
+    edit_lot = ParkingLot(location_name="Edit Lot", price=10, pin_code="000000",
+                          number_of_spots=spots_per_lot, available_spots=spots_per_lot, occupied_spots=0)
+    db.session.add(edit_lot)
+    db.session.flush()
+    db.session.add_all(ParkingSpot(lot_id=edit_lot.id, current_status="A") for _ in range(spots_per_lot))
+    db.session.commit()
+
+    # Older half of the history goes to the archive, so reads cover both tables
+    from tasks import archive_completed_reservations
+    archive_completed_reservations(db.engine, start + timedelta(minutes=97 * reservations // 2), 1000, 100)
+    return edit_lot.id
+
+
+def drive_endpoints(client, admin_headers, user_headers, lot_id, edit_lot_id):
+    """Yield (label, expected status, callable) for every registered API call worth
+    checking, with inputs that succeed so each endpoint runs all of its queries."""
+    held = []
+
+    def reserve():
+        response = client.post("/api/user/taking_spot", json={"lot_id": lot_id}, headers=user_headers)
+        held.append(response.get_json().get("spot_id"))
+        return response
+
+    def reserve_many(payload):
+        response = client.post("/api/user/taking_spots", json=payload, headers=user_headers)
+        held.extend(r["spot_id"] for r in response.get_json().get("reservations", []))
+        return response
+
+    yield "POST /api/login", 200, lambda: client.post(
+        "/api/login", json={"username": "plan1", "password": PLAN_PASSWORD})
+    yield "POST /api/register", 201, lambda: client.post(
+        "/api/register", json={"username": "plan-new", "email": "plan-new@example.com", "password": "secret1"})
+    yield "GET /api/user/view_lots", 200, lambda: client.get("/api/user/view_lots", headers=user_headers)
+    yield "POST /api/user/taking_spot", 201, reserve
+    yield "POST /api/user/leaving_spot", 200, lambda: client.post(
+        "/api/user/leaving_spot", json={"spot_id": held.pop()}, headers=user_headers)
+    yield "POST /api/user/taking_spots", 201, lambda: reserve_many({"count": 3, "lot_id": lot_id, "contiguous": True})
+    yield "POST /api/user/taking_spots?spread", 201, lambda: reserve_many(
+        {"count": 3, "lot_ids": [lot_id, lot_id + 1]})
+    yield "POST /api/user/leaving_spots", 200, lambda: client.post(
+        "/api/user/leaving_spots", json={"spot_ids": held}, headers=user_headers)
+    yield "GET /api/user/booking_history", 200, lambda: client.get("/api/user/booking_history", headers=user_headers)
+    yield "GET /api/user/summary", 200, lambda: client.get("/api/user/summary", headers=user_headers)
+    yield "GET /api/user/export_csv", 200, lambda: client.get("/api/user/export_csv", headers=user_headers)
+    yield "GET /api/admin/view_lots", 200, lambda: client.get("/api/admin/view_lots", headers=admin_headers)
+    yield "GET /api/admin/view_users", 200, lambda: client.get("/api/admin/view_users", headers=admin_headers)
+    yield "GET /api/admin/summary", 200, lambda: client.get("/api/admin/summary", headers=admin_headers)
+    yield "GET /api/admin/bookings", 200, lambda: client.get("/api/admin/bookings?limit=20", headers=admin_headers)
+    yield "GET /api/admin/bookings?status", 200, lambda: client.get(
+        "/api/admin/bookings?limit=20&status=active", headers=admin_headers)
+    yield "GET /api/admin/revenue_bylot", 200, lambda: client.get("/api/admin/revenue_bylot", headers=admin_headers)
+    yield "GET /api/admin/export_csv", 200, lambda: client.get("/api/admin/export_csv", headers=admin_headers)
+    yield "PUT /api/admin/edit_lot", 200, lambda: client.put(
+        f"/api/admin/edit_lot/{edit_lot_id}", json={"number_of_spots": 45}, headers=admin_headers)
+
+
+# ------------------------ Plan inspection ------------------------
+def sqlite_full_scans(conn, statement, params):
+    rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, params).fetchall()
+    scans = set()
+    for row in rows:
+        detail = row[-1]
+        # "SCAN reservations" is a full scan; "SCAN reservations USING INDEX ..." walks an index
+        # in order; "SCAN CONSTANT ROW" is a SELECT without FROM (scalar subqueries)
+        if detail.startswith("SCAN ") and " USING " not in detail and detail != "SCAN CONSTANT ROW":
+            scans.add(detail.split()[1])
+    return scans
+
+
+def postgres_full_scans(conn, statement, params):
+    conn.exec_driver_sql("SET enable_seqscan = off")
+    plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    scans = set()
+    stack = [plan[0]["Plan"]]
+    while stack:
+        node = stack.pop()
+        if node.get("Node Type") == "Seq Scan":
+            scans.add(node["Relation Name"])
+        stack.extend(node.get("Plans", []))
+    return scans
+
+
+def test_hot_queries_avoid_full_scans(app):
+    from sqlalchemy import event, inspect
+    from flask_jwt_extended import create_access_token
+    from controllers.database import db
+    from controllers.models import ParkingLot, ParkingSpot, Reservation
+
+    with app.app_context():
+        edit_lot_id = seed(db, (ParkingLot, ParkingSpot, Reservation))
+        admin_headers = {"Authorization": "Bearer " + create_access_token(
+            identity="adminmail@gmail.com", additional_claims={"roles": ["admin"]})}
+        user_headers = {"Authorization": "Bearer " + create_access_token(
+            identity="plan1@example.com", additional_claims={"roles": ["user"]})}
+        lot_id = ParkingLot.query.order_by(ParkingLot.id).first().id
+        engine = db.engine
+
+    captured = []
+    current = {"label": None}
+
+    def capture(conn, cursor, statement, params, context, executemany):
+        verb = statement.lstrip().split(None, 1)[0].upper()
+        if current["label"] and not executemany and verb in ("SELECT", "UPDATE", "DELETE", "WITH"):
+            captured.append((current["label"], statement, params))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    client = app.test_client()
+    unexpected = []
+    try:
+        for label, expected, call in drive_endpoints(client, admin_headers, user_headers, lot_id, edit_lot_id):
+            current["label"] = label
+            response = call()
+            response.get_data()   # streamed bodies (CSV) run their queries while being read
+            if response.status_code != expected:
+                unexpected.append(f"{label}: {response.status_code}, expected {expected}")
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    assert not unexpected, "\n".join(unexpected)
+
+    explain = postgres_full_scans if engine.dialect.name == "postgresql" else sqlite_full_scans
+    tables = set(inspect(engine).get_table_names())   # scans of subqueries/CTEs are not table scans
+    failures = []
+    seen = set()
+    with engine.connect() as conn:
+        for label, statement, params in captured:
+            if (label, statement) in seen:
+                continue
+            seen.add((label, statement))
+            scans = (explain(conn, statement, params) & tables) - ALLOWED_SCANS.get(label, set())
+            if scans:
+                failures.append(f"{label}: full scan of {', '.join(sorted(scans))}\n    {' '.join(statement.split())}")
+        conn.rollback()
+
+    assert seen, "no SQL was captured"
+    assert not failures, "\n".join(failures)
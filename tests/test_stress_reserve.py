@@ -0,0 +1,72 @@
+"""Concurrent reservation stress test for /api/user/taking_spot.
+
+Hammers one lot from many threads and then checks that no spot is held by two
+active reservations and that the lot counters agree with parking_spots.
+
+    python -m pytest tests/test_stress_reserve.py
+
+Runs against the test database (conftest.py); set DATABASE_URL to a scratch
+PostgreSQL database to exercise the SKIP LOCKED path.
+"""
+import threading
+import time
+from collections import Counter
+
+THREADS = 16
+SPOTS = 100
+REQUESTS = 200      # total reservation attempts, more than there are spots
+
+
+def test_concurrent_reservations_never_double_book(app):
+    from flask_jwt_extended import create_access_token
+    from controllers.database import db
+    from controllers.models import ParkingLot, ParkingSpot, Reservation
+    from controllers.user_datastore import user_datastore
+
+    with app.app_context():
+        user_role = user_datastore.find_or_create_role("user", description="Regular user role")
+        lot = ParkingLot(location_name="Stress Lot", price=10, pin_code="000000",
+                         number_of_spots=SPOTS, available_spots=SPOTS, occupied_spots=0)
+        db.session.add(lot)
+        db.session.flush()
+        db.session.add_all(ParkingSpot(lot_id=lot.id, current_status="A") for _ in range(SPOTS))
+
+        tokens = []
+        for i in range(THREADS):
+            email = f"stress{i}-{time.time_ns()}@example.com"
+            user_datastore.create_user(name=email, email=email, password="x", roles=[user_role])
+            tokens.append(create_access_token(identity=email, additional_claims={"roles": ["user"]}))
+        db.session.commit()
+        lot_id = lot.id
+
+    statuses = Counter()
+    per_thread = REQUESTS // THREADS
+    start_gate = threading.Barrier(THREADS)
+
+    def worker(token):
+        client = app.test_client()
+        headers = {"Authorization": f"Bearer {token}"}
+        start_gate.wait()
+        for _ in range(per_thread):
+            resp = client.post("/api/user/taking_spot", json={"lot_id": lot_id}, headers=headers)
+            statuses[resp.status_code] += 1
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in tokens]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    with app.app_context():
+        active_per_spot = Counter(
+            spot_id for (spot_id,) in db.session.query(Reservation.spot_id)
+            .join(ParkingSpot, ParkingSpot.id == Reservation.spot_id)
+            .filter(ParkingSpot.lot_id == lot_id, Reservation.current_status == "active")
+        )
+        occupied = ParkingSpot.query.filter_by(lot_id=lot_id, current_status="O").count()
+        lot = db.session.get(ParkingLot, lot_id)
+
+        assert not [spot for spot, n in active_per_spot.items() if n > 1], "spot held by two active reservations"
+        assert occupied == sum(active_per_spot.values())
+        assert (lot.available_spots, lot.occupied_spots) == (SPOTS - occupied, occupied), "counters drifted"
+    assert not [code for code in statuses if code >= 500], dict(statuses)